@@ -0,0 +1,73 @@
+"""
+Core CCAR conversion logic: layouts, parsing, merging, rules and formatting.
+
+This package only uses the standard library so it can be imported quickly by
+the Streamlit app, command line tools and worker processes alike. pandas is
+imported lazily by the few helpers that build DataFrames, and the modules that
+pull in heavier parts of the standard library are only imported when one of
+their names is first used (see _LAZY).
+"""
+from importlib import import_module
+
+from .batch import (
+    Batch, batch_file_name, encode_batch, get_latest_effective_date, lines_to_dataframe,
+    partition_by_month, write_zip,
+)
+from .cache import load_layouts_cached, load_registry_cached
+from .csvmap import CsvMapping, csv_mapping
+from .diff import diff_car, diff_rows, format_report, read_car_lines
+from .edit import LineEdit, edit_line
+from .encoding import TRANSLITERATION, check_widths, encode_line, transliterate
+from .formatter import format_csv_row, format_fixed_width, process_csv_to_fixed_length, validate_csv_input
+from .layout import Field, Layout, load_aliases, load_csv_layout, load_layout, normalize_name, parse_date
+from .merge import merge_json_by_priority
+from .parser import parse_fixed_width_text, split_fixed_width
+from .pipeline import (
+    convert_fields, convert_record, convert_text, convert_versioned_text, detect_format,
+    iter_records, iter_versioned_records,
+)
+from .record import Record, merge_records
+from .registry import LayoutRegistry, LayoutVersion, load_registry, registry_sources, single_version_registry
+from .rules import (
+    CompiledRule, RuleProblem, RuleReport, RuleStats, apply_compiled_rules, apply_rules, check_rules,
+    compile_rules, dead_rules, dependent_rules, format_rule_report, load_rules,
+)
+
+# Public names of the modules imported on first use
+_LAZY = {
+    'Archive': 'archive', 'RecordLocation': 'archive',
+    'find_chunk_boundaries': 'parallel', 'process_csv_file_to_fixed_length': 'parallel',
+    'split_csv_bytes': 'parallel',
+    'ConversionServer': 'service', 'ConversionService': 'service', 'serve': 'service',
+}
+
+__all__ = [
+    'Field', 'Layout', 'load_layout', 'load_csv_layout', 'load_aliases', 'normalize_name', 'parse_date',
+    'LayoutRegistry', 'LayoutVersion', 'load_registry', 'single_version_registry', 'registry_sources',
+    'load_registry_cached', 'load_layouts_cached',
+    'Record', 'merge_records', 'CsvMapping', 'csv_mapping',
+    'parse_fixed_width_text', 'split_fixed_width',
+    'merge_json_by_priority',
+    'load_rules', 'apply_rules', 'CompiledRule', 'compile_rules', 'apply_compiled_rules',
+    'RuleStats', 'RuleReport', 'RuleProblem', 'check_rules', 'dead_rules', 'dependent_rules', 'format_rule_report',
+    'LineEdit', 'edit_line',
+    'TRANSLITERATION', 'transliterate', 'encode_line', 'check_widths',
+    'format_fixed_width', 'format_csv_row', 'process_csv_to_fixed_length', 'validate_csv_input',
+    'Batch', 'get_latest_effective_date', 'batch_file_name', 'encode_batch', 'lines_to_dataframe',
+    'partition_by_month', 'write_zip',
+    'Archive', 'RecordLocation',
+    'find_chunk_boundaries', 'split_csv_bytes', 'process_csv_file_to_fixed_length',
+    'ConversionService', 'ConversionServer', 'serve',
+    'read_car_lines', 'diff_car', 'diff_rows', 'format_report',
+    'detect_format', 'iter_records', 'convert_record', 'convert_fields', 'convert_text',
+    'iter_versioned_records', 'convert_versioned_text',
+]
+
+
+def __getattr__(name):
+    try:
+        module = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = globals()[name] = getattr(import_module(f".{module}", __name__), name)
+    return value
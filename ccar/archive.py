@@ -0,0 +1,212 @@
+"""Local archive of downloaded .car batches with a client-history index."""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialised
+    fcntl = None
+
+from .batch import split_records
+from .layout import EFFECTIVE_DATE_FIELD
+
+ARCHIVE_DIR = '.ccar_archive'
+CLIENT_ID_FIELD = 'Client ID/Trails ID'
+MEDICAID_ID_FIELD = 'Medicaid/State Identifier'
+ADMISSION = '01'
+
+# Where a record is kept: the batch digest, its byte offset and length in the
+# uncompressed batch, its Action Type and its Effective Date as YYYYMMDD
+RecordLocation = namedtuple('RecordLocation', ['batch', 'offset', 'length', 'action_type', 'effective_date'])
+
+
+def _sortable_date(value):
+    # MMDDYYYY -> YYYYMMDD, so dates compare as strings; '' when invalid
+    if len(value) == 8 and value.isdigit():
+        return value[4:] + value[:4]
+    return ''
+
+
+class Archive:
+    """
+    Content-addressed store of .car batches.
+
+    Each batch is gzipped under objects/ by the blake2b digest of its bytes,
+    so storing the same batch twice is a no-op. index.json maps every Client
+    ID/Trails ID and Medicaid ID to the locations of its records, and to the
+    location of its latest admission, so a client's admission is found with
+    one dict lookup and read from its batch at a known offset.
+
+    Several Archive objects, in one process or many, may share a directory:
+    store holds a lock on index.lock while it rereads index.json, adds its
+    batch and writes the index back, and lookups reread the index when
+    another writer has replaced it.
+    """
+
+    def __init__(self, path=ARCHIVE_DIR):
+        self.path = path
+        self._index_path = os.path.join(path, 'index.json')
+        self._lock_path = os.path.join(path, 'index.lock')
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._load_index()
+
+    def _index_stamp(self):
+        try:
+            stat = os.stat(self._index_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load_index(self):
+        self.batches = {}
+        self.history = {CLIENT_ID_FIELD: {}, MEDICAID_ID_FIELD: {}}
+        self.admissions = {CLIENT_ID_FIELD: {}, MEDICAID_ID_FIELD: {}}
+        self._loaded = self._index_stamp()
+        if self._loaded is None:
+            return
+        with open(self._index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        self.batches = index['batches']
+        for field in self.history:
+            self.history[field] = {key: [RecordLocation(*location) for location in locations]
+                                   for key, locations in index['history'][field].items()}
+            self.admissions[field] = {key: RecordLocation(*location)
+                                      for key, location in index['admissions'][field].items()}
+
+    def _refresh(self):
+        # Pick up batches stored through another Archive since the last load
+        if self._index_stamp() != self._loaded:
+            self._load_index()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _object_path(self, digest):
+        return os.path.join(self.path, 'objects', digest[:2], f"{digest}.car.gz")
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _save_index(self):
+        index = {'batches': self.batches, 'history': self.history, 'admissions': self.admissions}
+        self._write_atomic(self._index_path, json.dumps(index).encode('utf-8'))
+        self._loaded = self._index_stamp()
+
+    def store(self, data, layout, name=None):
+        """
+        Archive a .car batch and index its records.
+
+        Args:
+            data (bytes): The batch as downloaded, CRLF or LF terminated.
+            layout (Layout or LayoutRegistry): Compiled layout(s) of its lines.
+            name (str): Optional file name to remember, such as 1940125.car.
+
+        Returns:
+            str: The batch digest.
+        """
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with self._locked():
+            # Reread the index under the lock so batches stored by other
+            # writers are kept when it is written back
+            self._load_index()
+            if digest in self.batches:
+                return digest
+            self._write_atomic(self._object_path(digest), gzip.compress(data))
+
+            count = 0
+            offset = 0
+            for content in split_records(data):
+                if content.strip():
+                    line = content.decode('utf-8')
+                    self._index_line(line, layout.layout_for_line(line), RecordLocation(
+                        digest, offset, len(content), '', ''))
+                    count += 1
+                # Each record is followed by its CRLF or LF terminator
+                offset += len(content)
+                offset += 2 if data[offset:offset + 1] == b'\r' else 1
+
+            self.batches[digest] = {'name': name, 'records': count}
+            self._save_index()
+        return digest
+
+    def _index_line(self, line, layout, location):
+        def value(field):
+            bounds = layout.offset_of(field)
+            return line[bounds[0]:bounds[1]].strip() if bounds else ''
+
+        location = location._replace(action_type=value('Action Type'),
+                                     effective_date=_sortable_date(value(EFFECTIVE_DATE_FIELD)))
+        for field in self.history:
+            key = value(field)
+            if not key:
+                continue
+            self.history[field].setdefault(key, []).append(location)
+            if location.action_type == ADMISSION:
+                latest = self.admissions[field].get(key)
+                if latest is None or location.effective_date >= latest.effective_date:
+                    self.admissions[field][key] = location
+
+    def read_batch(self, digest):
+        """Return the bytes of an archived batch."""
+        with gzip.open(self._object_path(digest), 'rb') as f:
+            return f.read()
+
+    def read_record(self, location):
+        """Return the fixed-width line at a RecordLocation."""
+        with gzip.open(self._object_path(location.batch), 'rb') as f:
+            f.seek(location.offset)
+            return f.read(location.length).decode('utf-8')
+
+    def _lookup(self, table, client_id, medicaid_id):
+        if client_id and client_id.strip() in table[CLIENT_ID_FIELD]:
+            return table[CLIENT_ID_FIELD][client_id.strip()]
+        if medicaid_id and medicaid_id.strip() in table[MEDICAID_ID_FIELD]:
+            return table[MEDICAID_ID_FIELD][medicaid_id.strip()]
+        return None
+
+    def client_history(self, client_id=None, medicaid_id=None):
+        """
+        List the archived records of a client, oldest Effective Date first.
+
+        The Client ID/Trails ID is looked up first, then the Medicaid ID.
+
+        Returns:
+            list: RecordLocation entries.
+        """
+        with self._lock:
+            self._refresh()
+            locations = self._lookup(self.history, client_id, medicaid_id) or []
+        return sorted(locations, key=lambda location: location.effective_date)
+
+    def latest_admission(self, client_id=None, medicaid_id=None):
+        """
+        Return the client's latest archived admission line, or None.
+
+        The Client ID/Trails ID is looked up first, then the Medicaid ID.
+        """
+        with self._lock:
+            self._refresh()
+            location = self._lookup(self.admissions, client_id, medicaid_id)
+        return self.read_record(location) if location is not None else None
+
@@ -0,0 +1,302 @@
+"""Operations over a batch of fixed-width CCAR lines."""
+import io
+import time
+
+from .encoding import LINE_TERMINATOR, check_widths, encode_line
+from .layout import EFFECTIVE_DATE_FIELD
+
+# Agency number that prefixes every .car file name
+FILE_PREFIX = '194'
+DEFAULT_FILE_NAME = 'clients_data.car'
+
+
+def effective_dates(lines, layout):
+    """
+    Yield the parsed Effective Date (or None) of each line.
+
+    layout may be a Layout or a LayoutRegistry; a registry reads each date at
+    the offset of the layout the line was written with.
+    """
+    for line in lines:
+        yield layout.effective_date(line)
+
+
+def get_latest_effective_date(lines, layout):
+    """
+    Find the latest Effective Date in a batch.
+
+    Args:
+        lines (list): Fixed-width CCAR records.
+        layout (Layout or LayoutRegistry): Compiled layout(s) from config.csv.
+
+    Returns:
+        datetime or None: The latest valid Effective Date.
+    """
+    return max((date for date in effective_dates(lines, layout) if date is not None), default=None)
+
+
+def batch_file_name(lines, layout):
+    """Name a batch 194MMYY.car after its latest Effective Date."""
+    latest_date = get_latest_effective_date(lines, layout)
+    if latest_date:
+        return f"{FILE_PREFIX}{latest_date.strftime('%m%y')}.car"
+    return DEFAULT_FILE_NAME
+
+
+def encode_batch(lines):
+    """Encode lines one byte per character and join them with CRLF terminators."""
+    return b''.join(encode_line(line) + LINE_TERMINATOR for line in lines)
+
+
+def partition_by_month(lines, layout):
+    """
+    Bucket lines into per-month .car files by their Effective Date.
+
+    Works in one pass, reading the month and year straight from the
+    Effective Date offset without parsing dates. Lines without a valid
+    MMDDYYYY date go into clients_data.car.
+
+    Args:
+        lines (list): Fixed-width CCAR records.
+        layout (Layout or LayoutRegistry): Compiled layout(s) from config.csv.
+
+    Returns:
+        dict: File names (194MMYY.car) mapped to their lines in batch order,
+        sorted by year and month.
+    """
+    buckets = {}
+    for line in lines:
+        bounds = layout.layout_for_line(line).offset_of(EFFECTIVE_DATE_FIELD)
+        value = line[bounds[0]:bounds[1]] if bounds else ''
+        if len(value) == 8 and value.isdigit() and '01' <= value[:2] <= '12':
+            key = (value[4:8], value[:2])
+        else:
+            key = None
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = []
+        bucket.append(line)
+
+    ordered = sorted((key for key in buckets if key is not None))
+    partitions = {f"{FILE_PREFIX}{month}{year[2:]}.car": buckets[(year, month)] for year, month in ordered}
+    if None in buckets:
+        partitions[DEFAULT_FILE_NAME] = buckets[None]
+    return partitions
+
+
+def write_zip(partitions, fileobj):
+    """
+    Stream partitioned lines into a zip archive, one .car member per partition.
+
+    Each member is written line by line with CRLF terminators, so no member
+    is built in memory as a whole.
+
+    Args:
+        partitions (dict): File names mapped to lines, as from partition_by_month.
+        fileobj: A writable binary file or buffer.
+    """
+    import zipfile
+
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, lines in partitions.items():
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w') as member:
+                for line in lines:
+                    member.write(encode_line(line))
+                    member.write(LINE_TERMINATOR)
+
+
+def lines_to_dataframe(lines, layout, headers=None):
+    """
+    Split a batch into a DataFrame with one column per layout field.
+
+    pandas is imported here rather than at module level so the core package
+    stays importable without it.
+
+    Args:
+        lines (list): Fixed-width CCAR records.
+        layout (Layout): Compiled layout from config.csv.
+        headers (list): Optional column labels, defaults to field names.
+
+    Returns:
+        pandas.DataFrame: Raw field values, spaces included.
+    """
+    import pandas as pd
+
+    slices = layout.slices
+    table_data = [[line[start:end] for start, end in slices] for line in lines]
+    return pd.DataFrame(table_data, columns=list(headers or layout.names))
+
+
+def _iter_records(fileobj, block_size=1 << 20):
+    # Records end in CRLF, but LF-only files are accepted too. In a CRLF file
+    # a bare LF is part of a value, so only CRLF splits records.
+    terminator = None
+    pending = b''
+    while True:
+        block = fileobj.read(block_size)
+        if not block:
+            break
+        pending += block
+        if terminator is None:
+            # A block's worth of data holds several records, enough to tell
+            if b'\r\n' in pending:
+                terminator = b'\r\n'
+            elif len(pending) >= block_size and b'\n' in pending:
+                terminator = b'\n'
+            else:
+                continue
+        *records, pending = pending.split(terminator)
+        yield from records
+    if terminator is None:
+        terminator = b'\n'
+    yield from pending.split(terminator)
+
+
+def split_records(data):
+    """
+    Split .car bytes into records, without terminators, as Batch.load does.
+
+    Only CRLF, or LF in a file without CRLF, ends a record; characters that
+    str.splitlines also breaks on (form feeds, \\x85, \\u2028, ...) are
+    kept in the record.
+    """
+    return list(_iter_records(io.BytesIO(data)))
+
+
+class Batch:
+    """
+    The fixed-width lines of a batch, with memoised views derived from them.
+
+    Views such as the preview text or the verification table are built on
+    first use and kept until the lines change, so code that reruns often
+    (like a Streamlit script) only recomputes them when the batch changes.
+    ``version`` increases with every change.
+
+    Each line is also encoded once, when it is added, into ``encoded``; a
+    download joins those bytes instead of encoding the whole batch again.
+    """
+
+    def __init__(self, lines=None):
+        self.lines = list(lines or [])
+        self.encoded = [encode_line(line) for line in self.lines]
+        self.version = 0
+        self._views = {}
+        self._updaters = {}
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __getitem__(self, index):
+        return self.lines[index]
+
+    def _changed(self):
+        self.version += 1
+        self._views.clear()
+
+    def append(self, line):
+        self.lines.append(line)
+        self.encoded.append(encode_line(line))
+        self._changed()
+
+    def extend(self, lines):
+        lines = list(lines)
+        self.lines.extend(lines)
+        self.encoded.extend(map(encode_line, lines))
+        self._changed()
+
+    def replace(self, index, line):
+        """
+        Replace one line, patching views that have an update function.
+
+        Other views are dropped and rebuilt on next use.
+        """
+        self.lines[index] = line
+        self.encoded[index] = encode_line(line)
+        self.version += 1
+        for name in list(self._views):
+            update = self._updaters.get(name)
+            value = update(self._views[name], index, line) if update is not None else None
+            if value is None:
+                del self._views[name]
+            else:
+                self._views[name] = value
+
+    def clear(self):
+        self.lines = []
+        self.encoded = []
+        self._changed()
+
+    def load(self, fileobj, widths, replace=False):
+        """
+        Append the records of a .car file, reading it in blocks.
+
+        CRLF or LF terminators and blank lines are handled. Every record's
+        byte length is checked against widths in one pass before anything is
+        added, so a file with a bad record leaves the batch unchanged.
+
+        Args:
+            fileobj: A binary file or buffer, such as an uploaded .car file.
+            widths (int or iterable): The layout width, or one per layout version.
+            replace (bool): Drop the current lines once the file has been checked.
+
+        Returns:
+            int: The number of records added.
+
+        Raises:
+            ValueError: If a record is not a layout width.
+        """
+        encoded = []
+        lines = []
+        for raw in _iter_records(fileobj):
+            if not raw.strip():
+                continue
+            line = raw.decode('utf-8')
+            lines.append(line)
+            encoded.append(raw if raw.isascii() else encode_line(line))
+
+        invalid = check_widths(encoded, widths)
+        if invalid:
+            numbers = ", ".join(str(index + 1) for index in invalid[:10])
+            more = f" and {len(invalid) - 10} more" if len(invalid) > 10 else ""
+            raise ValueError(f"{len(invalid)} record(s) are not the layout width: record {numbers}{more}")
+
+        if replace:
+            self.lines = []
+            self.encoded = []
+        self.lines.extend(lines)
+        self.encoded.extend(encoded)
+        self._changed()
+        return len(lines)
+
+    def to_bytes(self):
+        """The batch as a .car file: the encoded lines with CRLF terminators."""
+        return self.view('bytes', lambda lines: b''.join(line + LINE_TERMINATOR for line in self.encoded))
+
+    def invalid_lines(self, widths):
+        """Indexes of lines whose encoded length is not one of widths; see check_widths."""
+        return check_widths(self.encoded, widths)
+
+    def view(self, name, build, update=None):
+        """
+        Return a derived view of the lines, building it once per version.
+
+        Args:
+            name (str): Key of the view; use distinct names for distinct builds.
+            build (callable): Called with the list of lines to build the view.
+            update (callable): Optional; called as update(view, index, line)
+                when replace changes one line, returns the patched view, or
+                None to have it rebuilt.
+        """
+        if update is not None:
+            self._updaters[name] = update
+        try:
+            return self._views[name]
+        except KeyError:
+            value = self._views[name] = build(self.lines)
+            return value
@@ -0,0 +1,94 @@
+"""On-disk cache of compiled layouts and rules, keyed by their sources' content."""
+import glob
+import hashlib
+import os
+import pickle
+from functools import lru_cache
+
+from .csvmap import csv_mapping
+from .layout import ALIASES_FILE, load_csv_layout, load_layout
+from .registry import load_registry, registry_sources, single_version_registry
+from .rules import compile_rules, load_rules
+
+CACHE_DIR = '.ccar_cache'
+
+
+@lru_cache(maxsize=None)
+def _code_key():
+    # Entries hold pickled ccar objects, so any change to the package's own
+    # source invalidates them. Like .pyc files, sources are compared by
+    # modification time and size, which costs a stat per module.
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}\0{stat.st_mtime_ns}\0{stat.st_size}\0".encode('utf-8'))
+    return digest.digest()
+
+
+def _content_key(paths):
+    digest = hashlib.blake2b(_code_key(), digest_size=16)
+    for path in paths:
+        digest.update(os.path.abspath(path).encode('utf-8') + b'\0')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _precompile(registry):
+    # Rule tables and CSV mappings are cached on the layouts, so they are
+    # stored along with them
+    for version in registry.versions:
+        compile_rules(version.rules, version.layout)
+        csv_mapping(version.csv_layout, version.layout)
+    return registry
+
+
+def _cached(kind, paths, build, cache_dir):
+    # Entries for the same kind and first source share a prefix, so a
+    # rebuilt entry replaces the stale one instead of accumulating
+    prefix = f"{kind}-{hashlib.blake2b(os.path.abspath(paths[0]).encode('utf-8'), digest_size=4).hexdigest()}"
+    cache_path = os.path.join(cache_dir, f"{prefix}-{_content_key(paths)}.pickle")
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        pass  # A truncated or incompatible entry is rebuilt below
+
+    value = build()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+        for stale in glob.glob(os.path.join(cache_dir, f"{prefix}-*.pickle")):
+            if stale != cache_path:
+                os.remove(stale)
+    except OSError:
+        pass  # An unwritable cache only costs the next start a rebuild
+    return value
+
+
+def load_registry_cached(path='layouts.csv', cache_dir=CACHE_DIR):
+    """
+    Like load_registry, but loads the compiled registry from cache_dir.
+
+    The entry is keyed by the content of every source file (see
+    registry_sources) and of the ccar package itself, and rebuilt when any of
+    them changes. Rule tables and CSV mappings are compiled before the
+    registry is stored. Entries are unpickled, so cache_dir must not be
+    writable by anyone you would not let run code as you.
+    """
+    return _cached('registry', registry_sources(path), lambda: _precompile(load_registry(path)), cache_dir)
+
+
+def load_layouts_cached(config='config.csv', csv_config='csvToFL.csv', rules='rules.json', cache_dir=CACHE_DIR):
+    """
+    Load one config/csvToFL/rules set as a single-version registry, cached
+    like load_registry_cached.
+    """
+    sources = [config, os.path.join(os.path.dirname(config), ALIASES_FILE), csv_config, rules]
+    return _cached('layouts', sources, lambda: _precompile(single_version_registry(
+        load_layout(config), load_csv_layout(csv_config), load_rules(rules))), cache_dir)
@@ -0,0 +1,245 @@
+"""Command line interface: python -m ccar <command> ..."""
+import argparse
+import os
+import sys
+from collections import Counter
+
+from .batch import partition_by_month, write_zip
+from .cache import CACHE_DIR, load_layouts_cached, load_registry_cached
+from .diff import KEY_FIELDS, diff_car, format_report, read_car_lines
+from .layout import load_csv_layout, load_layout
+from .pipeline import INPUT_FORMATS, convert_text, convert_versioned_text
+from .registry import load_registry, single_version_registry
+from .rules import RuleStats, check_rules, dead_rules, format_rule_report, load_rules
+
+
+def _add_config_arguments(parser):
+    parser.add_argument('--config', default='config.csv', help="Record layout (default: config.csv)")
+    parser.add_argument('--csv-config', default='csvToFL.csv', help="CSV column layout (default: csvToFL.csv)")
+    parser.add_argument('--rules', default='rules.json', help="Rules file (default: rules.json)")
+    parser.add_argument('--layouts', help="Layout registry such as layouts.csv; selects each record's "
+                                          "layout by Effective Date and overrides the options above")
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f"Compile the layouts and rules from source instead of using {CACHE_DIR}")
+
+
+def _load_registry(args):
+    if args.no_cache:
+        if args.layouts:
+            return load_registry(args.layouts)
+        return single_version_registry(load_layout(args.config), load_csv_layout(args.csv_config),
+                                       load_rules(args.rules))
+    if args.layouts:
+        return load_registry_cached(args.layouts)
+    return load_layouts_cached(args.config, args.csv_config, args.rules)
+
+
+def _read_input(path):
+    if path == '-':
+        return sys.stdin.read()
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def cmd_convert(args):
+    if args.jobs is not None:
+        return _convert_parallel(args)
+
+    text = _read_input(args.input)
+    stats = RuleStats() if args.rule_stats else None
+    unknown = []
+    registry = _load_registry(args)
+    if args.layouts:
+        target = None
+        if args.target:
+            target = next((v for v in registry.versions if v.name == args.target), None)
+            if target is None:
+                raise ValueError(f"Unknown layout version: {args.target}")
+        lines = convert_versioned_text(text, args.format, registry, target, stats, unknown)
+    else:
+        current = registry.current
+        lines = convert_text(text, args.format, current.layout, current.csv_layout, current.rules, stats, unknown)
+
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        for line in lines:
+            out.write(line + '\r\n')
+    finally:
+        if args.output:
+            out.close()
+    if unknown:
+        counts = Counter(unknown)
+        print("Ignored unknown fields: " + ", ".join(f"{name} ({count})" for name, count in counts.most_common()),
+              file=sys.stderr)
+    if stats is not None:
+        print(format_rule_report(stats, dead_rules(stats)), file=sys.stderr)
+    return 0
+
+
+def _convert_parallel(args):
+    from .parallel import process_csv_file_to_fixed_length
+
+    if args.format != 'csv' or args.input == '-' or not args.output:
+        raise ValueError("--jobs requires --format csv, an input file and --output")
+    if args.rule_stats:
+        raise ValueError("--rule-stats cannot be combined with --jobs")
+    current = _load_registry(args).current
+    count = process_csv_file_to_fixed_length(args.input, args.output, current.csv_layout, current.layout,
+                                             current.rules, workers=args.jobs or None)
+    print(f"Wrote {count} records to {args.output}", file=sys.stderr)
+    return 0
+
+
+def _load_layouts(args):
+    registry = _load_registry(args)
+    return registry if args.layouts else registry.current.layout
+
+
+def cmd_diff(args):
+    layout = _load_layouts(args)
+    with open(args.old, 'rb') as f:
+        old_lines = read_car_lines(f.read())
+    with open(args.new, 'rb') as f:
+        new_lines = read_car_lines(f.read())
+    result = diff_car(old_lines, new_lines, layout, tuple(args.key) if args.key else KEY_FIELDS)
+    print(format_report(result))
+    # Exit like diff(1): 0 when identical, 1 when records differ
+    return 1 if result.added or result.removed or result.changed else 0
+
+
+def cmd_split(args):
+    layout = _load_layouts(args)
+    with open(args.input, 'rb') as f:
+        lines = read_car_lines(f.read())
+    partitions = partition_by_month(lines, layout)
+    with open(args.output, 'wb') as out:
+        write_zip(partitions, out)
+    for name, month_lines in partitions.items():
+        print(f"{name}: {len(month_lines)} records", file=sys.stderr)
+    return 0
+
+
+def cmd_serve(args):
+    from .service import serve
+
+    registry = _load_registry(args)
+    serve(registry, args.host, args.port, workers=args.workers, max_requests=args.max_requests)
+    return 0
+
+
+def _open_archive(args):
+    from .archive import ARCHIVE_DIR, Archive
+
+    return Archive(args.archive or ARCHIVE_DIR)
+
+
+def cmd_archive(args):
+    layout = _load_layouts(args)
+    archive = _open_archive(args)
+    for path in args.inputs:
+        with open(path, 'rb') as f:
+            digest = archive.store(f.read(), layout, os.path.basename(path))
+        print(f"{digest}  {path}")
+    return 0
+
+
+def cmd_history(args):
+    archive = _open_archive(args)
+    if args.admission:
+        line = archive.latest_admission(args.client, args.medicaid)
+        if line is None:
+            print("No archived admission found", file=sys.stderr)
+            return 1
+        print(line)
+        return 0
+    locations = archive.client_history(args.client, args.medicaid)
+    for location in locations:
+        print(archive.read_record(location))
+    return 0 if locations else 1
+
+
+def cmd_rules(args):
+    registry = _load_registry(args)
+    if args.input:
+        stats = RuleStats()
+        convert_versioned_text(_read_input(args.input), args.format, registry, stats=stats)
+        print(format_rule_report(stats, dead_rules(stats)))
+
+    found = False
+    for version in registry.versions:
+        for problem in check_rules(version.rules, version.layout):
+            prefix = f"[{version.name}] " if len(registry.versions) > 1 else ''
+            print(f"! {prefix}rule {problem.index} {problem.target or ''}: {problem.message}")
+            found = True
+    return 1 if found else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='ccar', description="CCAR batch conversion tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help="Convert JSON, JSONL, CSV or fixed-width input to .car lines")
+    convert.add_argument('input', help="Input file, or - for stdin")
+    convert.add_argument('-o', '--output', help="Output .car file (default: stdout)")
+    convert.add_argument('-f', '--format', choices=INPUT_FORMATS, default='auto')
+    convert.add_argument('-j', '--jobs', type=int, nargs='?', const=0,
+                         help="Convert CSV input in parallel with this many worker processes "
+                              "(default: one per CPU); uses the current layout version")
+    convert.add_argument('--target', help="With --layouts, re-export every record into this layout version")
+    convert.add_argument('--rule-stats', action='store_true',
+                         help="Print how often each rule fired, its cost and rules that never fired to stderr")
+    _add_config_arguments(convert)
+    convert.set_defaults(func=cmd_convert)
+
+    diff = commands.add_parser('diff', help="List added, removed and changed records between two .car files")
+    diff.add_argument('old', help="Earlier .car file")
+    diff.add_argument('new', help="Corrected .car file")
+    diff.add_argument('--key', action='append', default=None,
+                      help=f"Key field name, may be repeated (default: {', '.join(KEY_FIELDS)})")
+    _add_config_arguments(diff)
+    diff.set_defaults(func=cmd_diff)
+
+    split = commands.add_parser('split', help="Split a .car file into per-month 194MMYY.car files in a zip")
+    split.add_argument('input', help="Input .car file")
+    split.add_argument('-o', '--output', required=True, help="Output .zip file")
+    _add_config_arguments(split)
+    split.set_defaults(func=cmd_split)
+
+    archive = commands.add_parser('archive', help="Store .car files in the local archive and index their clients")
+    archive.add_argument('inputs', nargs='+', help=".car files to archive")
+    archive.add_argument('--archive', help="Archive directory (default: .ccar_archive)")
+    _add_config_arguments(archive)
+    archive.set_defaults(func=cmd_archive)
+
+    history = commands.add_parser('history', help="Print a client's archived records, oldest first")
+    history.add_argument('--client', help="Client ID/Trails ID")
+    history.add_argument('--medicaid', help="Medicaid/State Identifier, used when --client is not found")
+    history.add_argument('--admission', action='store_true', help="Print only the latest admission")
+    history.add_argument('--archive', help="Archive directory (default: .ccar_archive)")
+    history.set_defaults(func=cmd_history)
+
+    rules = commands.add_parser('rules', help="Check rules.json for dead or shadowed rules")
+    rules.add_argument('input', nargs='?', help="Optional input to convert and report rule firing counts for")
+    rules.add_argument('-f', '--format', choices=INPUT_FORMATS, default='auto')
+    _add_config_arguments(rules)
+    rules.set_defaults(func=cmd_rules)
+
+    serve = commands.add_parser('serve', help="Run a local HTTP conversion service")
+    serve.add_argument('--host', default='127.0.0.1', help="Address to bind (default: 127.0.0.1)")
+    serve.add_argument('--port', type=int, default=8765, help="Port to listen on (default: 8765)")
+    serve.add_argument('--workers', type=int, help="Worker processes (default: one per CPU)")
+    serve.add_argument('--max-requests', type=int, default=4,
+                              help="Requests converted concurrently before returning 503 (default: 4)")
+    _add_config_arguments(serve)
+    serve.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"ccar: error: {e}", file=sys.stderr)
+        return 2
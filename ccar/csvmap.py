@@ -0,0 +1,103 @@
+"""Direct mapping from csvToFL.csv columns to config.csv record fields."""
+import csv
+import io
+
+from .layout import DIAGNOSIS_FIELDS
+from .record import Record
+
+
+class CsvMapping:
+    """
+    Precompiled mapping from CSV columns to record field ordinals.
+
+    Both layouts describe the same fixed-width line, so every CSV column
+    covers a byte range of the record. Each column is mapped once to the
+    fields inside that range, which lets a CSV row become a Record without
+    formatting it to fixed-width text and parsing that text again.
+
+    Values match that round trip field by field, with two intentional
+    differences. The old parse stripped the whole line first, which shifted
+    every field when the first column was blank-padded; here each field is
+    taken from its own byte range. And repeated names (Suicide Attempt,
+    Sexual Misconduct, Danger to Self) keep each occurrence's own value
+    instead of collapsing to the last non-empty one; merge_records still
+    merges them as one value.
+    """
+
+    def __init__(self, csv_layout, layout):
+        self.csv_layout = csv_layout
+        self.layout = layout
+        self.spans_columns = False
+        columns = []
+        for column in csv_layout.fields:
+            if column.length <= 0:  # Fields with 0 length are not output
+                continue
+            col_start, col_end = column.offset, column.offset + column.length
+            pieces = []
+            for field, (start, end) in zip(layout.fields, layout.slices):
+                if end <= col_start or start >= col_end or start == end:
+                    continue
+                partial = start < col_start or end > col_end
+                self.spans_columns = self.spans_columns or partial
+                pieces.append((field.ordinal, max(start, col_start) - col_start,
+                               min(end, col_end) - col_start, partial))
+            if not pieces:
+                continue
+            direct = len(pieces) == 1 and not pieces[0][3] and pieces[0][1] == 0 and pieces[0][2] == column.length
+            columns.append((column.ordinal, column.length, column.alignment == 'right',
+                            column.name in DIAGNOSIS_FIELDS, direct, tuple(pieces)))
+        self._columns = tuple(columns)
+
+    def record_from_row(self, row):
+        """Map one parsed CSV row (a list of strings) to a Record."""
+        values = [''] * len(self.layout.fields)
+        parts = {} if self.spans_columns else None
+        row_length = len(row)
+        for index, length, right, strip_periods, direct, pieces in self._columns:
+            value = row[index].strip() if index < row_length else ''
+            if strip_periods:
+                value = value.replace(".", "")
+            if direct:
+                values[pieces[0][0]] = value[:length].strip()
+                continue
+            value = value[:length]
+            value = value.rjust(length) if right else value.ljust(length)
+            for ordinal, start, end, partial in pieces:
+                if partial:
+                    parts.setdefault(ordinal, []).append(value[start:end])
+                else:
+                    values[ordinal] = value[start:end].strip()
+        if parts:
+            for ordinal, chunks in parts.items():
+                values[ordinal] = ''.join(chunks).strip()
+        return Record(self.layout, values)
+
+    def records_from_text(self, csv_text):
+        """
+        Parse headerless CSV text into records in a single pass.
+
+        Args:
+            csv_text (str): CSV formatted text input.
+
+        Returns:
+            list: One Record per CSV row.
+
+        Raises:
+            ValueError: If the text cannot be parsed or has no rows.
+        """
+        try:
+            rows = list(csv.reader(io.StringIO(csv_text)))
+        except csv.Error as e:
+            raise ValueError(f"Error parsing CSV: {e}") from e
+        if not rows:
+            raise ValueError("CSV input is empty")
+        return [self.record_from_row(row) for row in rows]
+
+
+def csv_mapping(csv_layout, layout):
+    """Return the CsvMapping between two layouts, compiled once and cached."""
+    cached = csv_layout._csv_mappings.get(id(layout))
+    if cached is None or cached.layout is not layout:
+        cached = CsvMapping(csv_layout, layout)
+        csv_layout._csv_mappings[id(layout)] = cached
+    return cached
@@ -0,0 +1,156 @@
+"""Record- and field-level differences between two .car files."""
+import hashlib
+from collections import namedtuple
+
+from .batch import split_records
+
+# Fields identifying a client's record within a batch
+KEY_FIELDS = ('Client ID/Trails ID', 'Action Type')
+
+FieldChange = namedtuple('FieldChange', ['name', 'before', 'after'])
+RecordChange = namedtuple('RecordChange', ['key', 'before', 'after', 'fields'])
+CarDiff = namedtuple('CarDiff', ['added', 'removed', 'changed', 'unchanged'])
+
+
+def read_car_lines(data):
+    """
+    Split .car content (bytes or str, LF or CRLF) into its non-blank lines.
+
+    Records are split as Batch.load splits them (see split_records).
+
+    Raises:
+        ValueError: If the content is not UTF-8.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return [raw.decode('utf-8') for raw in split_records(data) if raw.strip()]
+
+
+def content_hash(line):
+    """Return a short digest of a record's exact content."""
+    return hashlib.blake2b(line.encode('utf-8'), digest_size=16).digest()
+
+
+def record_key(line, layout, key_fields=KEY_FIELDS):
+    """Return the tuple of stripped key field values of a line."""
+    layout = layout.layout_for_line(line)
+    values = []
+    for name in key_fields:
+        bounds = layout.offset_of(name)
+        values.append(line[bounds[0]:bounds[1]].strip() if bounds else '')
+    return tuple(values)
+
+
+def index_lines(lines, layout, key_fields=KEY_FIELDS):
+    """
+    Index lines by client key, hashing each record once.
+
+    A key seen more than once in the same file gets an occurrence number, so
+    repeated records are matched in file order.
+
+    Args:
+        lines (list): Fixed-width CCAR records.
+        layout (Layout or LayoutRegistry): Layout(s) of the lines.
+        key_fields (tuple): Field names forming the key.
+
+    Returns:
+        dict: (key, occurrence) mapped to (content hash, line).
+    """
+    index = {}
+    seen = {}
+    for line in lines:
+        key = record_key(line, layout, key_fields)
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        index[(key, occurrence)] = (content_hash(line), line)
+    return index
+
+
+def diff_fields(before, after, layout):
+    """List the fields whose values differ between two lines, with stripped values."""
+    before_layout = layout.layout_for_line(before)
+    after_layout = layout.layout_for_line(after)
+    if before_layout is after_layout:
+        return [FieldChange(name, before[start:end].strip(), after[start:end].strip())
+                for name, (start, end) in zip(before_layout.names, before_layout.slices)
+                if before[start:end] != after[start:end]]
+
+    # Lines from different layout versions are compared by field name
+    old_values = dict(zip(before_layout.names, (before[s:e].strip() for s, e in before_layout.slices)))
+    new_values = dict(zip(after_layout.names, (after[s:e].strip() for s, e in after_layout.slices)))
+    return [FieldChange(name, old_values.get(name, ''), new_values.get(name, ''))
+            for name in dict.fromkeys(list(old_values) + list(new_values))
+            if old_values.get(name, '') != new_values.get(name, '')]
+
+
+def diff_car(old_lines, new_lines, layout, key_fields=KEY_FIELDS):
+    """
+    Compare two batches record by record in linear time.
+
+    Both batches are indexed by client key. Records present in both are
+    compared by content hash, and only those whose hashes differ are compared
+    field by field.
+
+    Args:
+        old_lines (list): Records of the earlier file.
+        new_lines (list): Records of the corrected file.
+        layout (Layout or LayoutRegistry): Layout(s) of the lines.
+        key_fields (tuple): Field names forming the client key.
+
+    Returns:
+        CarDiff: added and removed are lists of (key, line), changed is a list
+        of RecordChange and unchanged is a count.
+    """
+    old_index = index_lines(old_lines, layout, key_fields)
+    new_index = index_lines(new_lines, layout, key_fields)
+
+    added, removed, changed = [], [], []
+    unchanged = 0
+    for key, (old_hash, old_line) in old_index.items():
+        new_entry = new_index.get(key)
+        if new_entry is None:
+            removed.append((key, old_line))
+        elif new_entry[0] == old_hash:
+            unchanged += 1
+        else:
+            changed.append(RecordChange(key, old_line, new_entry[1], diff_fields(old_line, new_entry[1], layout)))
+    for key, (_, new_line) in new_index.items():
+        if key not in old_index:
+            added.append((key, new_line))
+    return CarDiff(added, removed, changed, unchanged)
+
+
+def format_key(key):
+    """Render an indexed key such as (('H123', '01'), 1) as 'H123 / 01 #2'."""
+    values, occurrence = key
+    label = ' / '.join(value or '(blank)' for value in values)
+    return f"{label} #{occurrence + 1}" if occurrence else label
+
+
+def diff_rows(result):
+    """Flatten a CarDiff into (key, status, field, before, after) rows for display."""
+    rows = []
+    for key, _ in result.added:
+        rows.append((format_key(key), 'added', '', '', ''))
+    for key, _ in result.removed:
+        rows.append((format_key(key), 'removed', '', '', ''))
+    for change in result.changed:
+        for field in change.fields:
+            rows.append((format_key(change.key), 'changed', field.name, field.before, field.after))
+    return rows
+
+
+def format_report(result):
+    """Render a CarDiff as plain text."""
+    lines = []
+    for key, _ in result.added:
+        lines.append(f"+ {format_key(key)}")
+    for key, _ in result.removed:
+        lines.append(f"- {format_key(key)}")
+    for change in result.changed:
+        lines.append(f"~ {format_key(change.key)}")
+        for field in change.fields:
+            lines.append(f"    {field.name}: {field.before!r} -> {field.after!r}")
+    lines.append(f"{len(result.added)} added, {len(result.removed)} removed, "
+                 f"{len(result.changed)} changed, {result.unchanged} unchanged")
+    return '\n'.join(lines)
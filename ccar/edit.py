@@ -0,0 +1,83 @@
+"""In-place edits of fixed-width lines at their layout offsets."""
+from .encoding import transliterate
+from .rules import apply_compiled_rules, compile_rules, dependent_rules
+
+
+class LineEdit:
+    """
+    Pending field changes to one fixed-width line.
+
+    Reading an ordinal returns its pending value, or the stripped slice of the
+    line when it has not been changed, so rules can be applied to a LineEdit
+    as to a Record (``values`` is the edit itself). to_line formats only the
+    changed fields and splices them into the line at their offsets.
+    """
+
+    __slots__ = ('line', 'layout', 'changes')
+
+    def __init__(self, line, layout):
+        self.line = line
+        self.layout = layout
+        self.changes = {}
+
+    @property
+    def values(self):
+        return self
+
+    def __getitem__(self, ordinal):
+        try:
+            return self.changes[ordinal]
+        except KeyError:
+            start, end = self.layout.slices[ordinal]
+            return self.line[start:end].strip()
+
+    def __setitem__(self, ordinal, value):
+        self.changes[ordinal] = value
+
+    def set(self, name, value):
+        """Set every occurrence of a field by name."""
+        ordinals = self.layout.resolve(name)
+        if ordinals is None:
+            raise ValueError(f"Unknown field: {name}")
+        for ordinal in ordinals:
+            self.changes[ordinal] = value
+
+    def to_line(self):
+        """The line with every changed field formatted as Record.to_line does."""
+        line = self.line.ljust(self.layout.width)
+        for ordinal in sorted(self.changes):
+            length, right, strip_periods = self.layout.formats[ordinal]
+            value = transliterate(str(self.changes[ordinal] or '').strip())
+            if strip_periods:
+                value = value.replace(".", "")
+            value = value[:length]
+            start, end = self.layout.slices[ordinal]
+            line = line[:start] + (value.rjust(length) if right else value.ljust(length)) + line[end:]
+        return line
+
+
+def edit_line(line, layout, fields, rules=None):
+    """
+    Change some fields of a fixed-width line without rebuilding it.
+
+    Only the edited fields' slices are rewritten. When rules are given, the
+    rules that write an edited field or whose conditions read one (see
+    dependent_rules) are re-run, and only the fields they write are
+    rewritten too.
+
+    Args:
+        line (str): A fixed-width CCAR line.
+        layout (Layout): The layout the line was written with.
+        fields (dict): Field names mapped to their new values.
+        rules (list): Optional rule dictionaries from rules.json.
+
+    Returns:
+        str: The edited line.
+    """
+    edit = LineEdit(line, layout)
+    for name, value in fields.items():
+        edit.set(name, value)
+    if rules:
+        compiled = dependent_rules(compile_rules(rules, layout), edit.changes)
+        apply_compiled_rules(edit, compiled)
+    return edit.to_line()
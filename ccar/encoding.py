@@ -0,0 +1,91 @@
+"""Byte-exact encoding of fixed-width lines as single-byte ASCII."""
+import unicodedata
+
+LINE_TERMINATOR = b'\r\n'
+
+# Characters without an ASCII decomposition that still have an obvious stand-in
+_EXTRA = {
+    'Æ': 'A', 'æ': 'a', 'Ð': 'D', 'ð': 'd', 'Ø': 'O', 'ø': 'o', 'Þ': 'T', 'þ': 't', 'ß': 's',
+    'Đ': 'D', 'đ': 'd', 'Ħ': 'H', 'ħ': 'h', 'ı': 'i', 'Ł': 'L', 'ł': 'l', 'Œ': 'O', 'œ': 'o',
+    '\u00a0': ' ', '\u00ad': '-', '«': '"', '»': '"',
+    '\u2010': '-', '\u2011': '-', '\u2012': '-', '\u2013': '-', '\u2014': '-', '\u2015': '-',
+    '‘': "'", '’': "'", '‚': "'", '‛': "'",
+    '“': '"', '”': '"', '„': '"', '‟': '"',
+    '…': '.', '′': "'", '″': '"',
+}
+
+
+def _stand_in(char):
+    if char in _EXTRA:
+        return _EXTRA[char]
+    base = unicodedata.normalize('NFKD', char)[:1]
+    return base if base.isascii() and base.isprintable() and base else '?'
+
+
+class _Transliteration(dict):
+    # Only code points outside the precomputed ranges reach this; they are
+    # resolved and kept on first use
+    def __missing__(self, codepoint):
+        value = self[codepoint] = _stand_in(chr(codepoint))
+        return value
+
+
+# Every non-ASCII character maps to exactly one ASCII character, so a
+# translated line keeps its width and encodes to one byte per character.
+# ASCII maps to itself, so translating it is a plain dict hit.
+TRANSLITERATION = _Transliteration(str.maketrans({chr(codepoint): chr(codepoint) for codepoint in range(128)}))
+TRANSLITERATION.update(
+    (codepoint, _stand_in(chr(codepoint)))
+    for block in (range(0x80, 0x250), range(0x2000, 0x2070))
+    for codepoint in block
+)
+
+
+def transliterate(value):
+    """
+    Replace the non-ASCII characters of a field value with ASCII stand-ins.
+
+    Combining sequences are composed first, so "Jose" followed by a combining
+    acute accent becomes "Jose" rather than "Jose?". Characters with no
+    stand-in become "?".
+    """
+    if value.isascii():
+        return value
+    return unicodedata.normalize('NFC', value).translate(TRANSLITERATION)
+
+
+def encode_line(line):
+    """
+    Encode a fixed-width line to ASCII bytes, one byte per character.
+
+    Unlike transliterate, no normalisation is done, so the byte length always
+    equals the character length of the line.
+    """
+    if not line.isascii():
+        line = line.translate(TRANSLITERATION)
+    return line.encode('ascii')
+
+
+def check_widths(encoded, widths):
+    """
+    Find encoded lines whose byte length is not a layout width.
+
+    The lengths are compared in one vectorised pass: with numpy when it is
+    installed (imported here so the package does not require it), otherwise
+    over map(len, ...).
+
+    Args:
+        encoded (list): Encoded lines without terminators.
+        widths (int or iterable): The allowed width, or one per layout version.
+
+    Returns:
+        list: Indexes of the lines with a wrong length.
+    """
+    allowed = [widths] if isinstance(widths, int) else sorted(set(widths))
+    try:
+        import numpy as np
+    except ImportError:
+        allowed = set(allowed)
+        return [index for index, length in enumerate(map(len, encoded)) if length not in allowed]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    return np.flatnonzero(~np.isin(lengths, allowed)).tolist()
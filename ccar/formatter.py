@@ -0,0 +1,104 @@
+"""Fixed-width formatting of field dictionaries and CSV rows."""
+import csv
+import io
+
+from .encoding import transliterate
+from .layout import DIAGNOSIS_FIELDS
+
+
+def _pad(value, length, alignment):
+    # Transliterate before truncating so the padded value is length bytes too
+    value = transliterate(value)
+    if alignment == 'right':
+        return value[:length].rjust(length)
+    return value[:length].ljust(length)
+
+
+def format_fixed_width(fields, layout):
+    """
+    Format a field dictionary into one fixed-width record.
+
+    Args:
+        fields (dict): Field names mapped to values.
+        layout (Layout): Compiled layout from config.csv.
+
+    Returns:
+        str: The record, exactly layout.width ASCII characters long.
+    """
+    parts = []
+    for field in layout.fields:
+        value = fields.get(field.name)
+        # Get the value, convert to string, and remove surrounding spaces
+        value = '' if value is None else str(value).strip()
+
+        # Special handling for diagnosis fields - remove periods
+        if field.name in DIAGNOSIS_FIELDS:
+            value = value.replace(".", "")
+
+        parts.append(_pad(value, field.length, field.alignment))
+    return ''.join(parts)
+
+
+def format_csv_row(row, csv_layout):
+    """Format one parsed CSV row into a fixed-width line using the csvToFL layout."""
+    line_parts = []
+    row_length = len(row)
+    for idx, field in enumerate(csv_layout.fields):
+        if field.length <= 0:  # Skip fields with 0 length
+            continue
+        # Get the value from the CSV input using the column index
+        value = row[idx].strip() if idx < row_length else ""
+
+        # Special handling for Primary Diagnosis 1 field - remove periods
+        if field.name in DIAGNOSIS_FIELDS:
+            value = value.replace(".", "")
+
+        line_parts.append(_pad(value, field.length, field.alignment))
+    return ''.join(line_parts)
+
+
+def process_csv_to_fixed_length(csv_text, csv_layout):
+    """
+    Process CSV formatted text into fixed length text according to csvToFL.csv specifications.
+    Assumes columns are in the correct order without headers.
+
+    Args:
+        csv_text (str): CSV formatted text input
+        csv_layout (Layout): Compiled layout from csvToFL.csv
+
+    Returns:
+        str: Fixed-length formatted text
+    """
+    try:
+        # Use csv.reader to properly handle quoted fields that may contain commas
+        rows = list(csv.reader(io.StringIO(csv_text)))
+    except Exception as e:
+        return f"Error parsing CSV: {str(e)}"
+
+    return '\n'.join(format_csv_row(row, csv_layout) for row in rows)
+
+
+def validate_csv_input(csv_text, csv_layout):
+    """
+    Basic validation for CSV input - just checks if it can be parsed.
+    Assumes columns are in the correct order without headers.
+
+    Args:
+        csv_text (str): CSV formatted text input
+        csv_layout (Layout): Compiled layout from csvToFL.csv
+
+    Returns:
+        tuple: (is_valid, error_message)
+    """
+    try:
+        # Use csv.reader to properly handle quoted fields that may contain commas
+        rows = list(csv.reader(io.StringIO(csv_text)))
+
+        # Check if we have enough data in at least one row
+        if not rows:
+            return False, "CSV input is empty"
+
+        # Basic validation passed
+        return True, "CSV input is valid"
+    except Exception as e:
+        return False, f"Error validating CSV: {str(e)}"
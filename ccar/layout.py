@@ -0,0 +1,230 @@
+"""Compiled fixed-width layouts loaded from config.csv and csvToFL.csv."""
+import csv
+import os
+import re
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+
+CONFIG_COLUMNS = ['order', 'name', 'length', 'alignment']
+CSV_TO_FL_COLUMNS = ['order', 'name', 'output_length', 'alignment']
+ALIASES_COLUMNS = ['alias', 'field']
+ALIASES_FILE = 'aliases.csv'
+
+EFFECTIVE_DATE_FIELD = 'Effective Date'
+DATE_FORMAT = '%m%d%Y'
+
+# Fields whose values have their periods removed before formatting
+DIAGNOSIS_FIELDS = frozenset(["Primary Diagnosis 1", "DC03 AXIS I Primary Diagnosis"])
+
+Field = namedtuple('Field', [
+    'ordinal', 'order', 'name', 'length', 'offset', 'alignment',
+    'action_type', 'not_in_eval', 'json_priority',
+])
+
+
+_NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name):
+    """Case-fold a field name and collapse its punctuation and spacing."""
+    return _NON_ALPHANUMERIC.sub(' ', name.casefold()).strip()
+
+
+def parse_date(value):
+    """Parse an MMDDYYYY date, returning None when it is blank or invalid."""
+    try:
+        return datetime.strptime(value.strip(), DATE_FORMAT)
+    except (AttributeError, ValueError):
+        return None
+
+
+class Layout:
+    """
+    An ordered fixed-width layout with offsets and lookups computed once.
+
+    Fields are sorted by their ``order`` column and numbered by ordinal
+    (their position in that sorted sequence). ``index`` maps a field name to
+    the ordinal of its last occurrence, matching how a dict keyed by field
+    name behaves when the layout repeats a name; ``ordinals`` maps it to
+    every occurrence. ``aliases`` maps other spellings of a name (see
+    resolve) to the same ordinals.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.names = tuple(field.name for field in self.fields)
+        self.width = sum(field.length for field in self.fields)
+        self.index = {field.name: field.ordinal for field in self.fields}
+        ordinals = {}
+        for field in self.fields:
+            ordinals.setdefault(field.name, []).append(field.ordinal)
+        self.ordinals = {name: tuple(found) for name, found in ordinals.items()}
+        self.aliases = dict(self.ordinals)
+        for name, found in self.ordinals.items():
+            self.aliases.setdefault(normalize_name(name), found)
+        # Ordinals of each name that occurs more than once
+        self.repeated = tuple(found for found in self.ordinals.values() if len(found) > 1)
+        # A repeated name has one priority, its last occurrence's, as in a dict
+        self.priorities = {field.name: field.json_priority for field in self.fields}
+        # Per-ordinal flags used by merges and the formatter
+        self.discharge_priority = tuple(self.priorities[name] == 'discharge' for name in self.names)
+        self.formats = tuple(
+            (field.length, field.alignment == 'right', field.name in DIAGNOSIS_FIELDS)
+            for field in self.fields
+        )
+        # Compiled rule tables keyed by id() of the source rules list
+        self._compiled_rules = {}
+        # CsvMappings to other layouts keyed by id() of the target layout
+        self._csv_mappings = {}
+        # Precomputed (start, end) byte ranges for slicing records
+        self.slices = tuple((field.offset, field.offset + field.length) for field in self.fields)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The caches are keyed by id(), which does not survive pickling
+        state['_compiled_rules'] = list(self._compiled_rules.values())
+        state['_csv_mappings'] = list(self._csv_mappings.values())
+        return state
+
+    def __setstate__(self, state):
+        compiled_rules = state.pop('_compiled_rules')
+        csv_mappings = state.pop('_csv_mappings')
+        self.__dict__.update(state)
+        self._compiled_rules = {id(rules): (rules, compiled) for rules, compiled in compiled_rules}
+        self._csv_mappings = {id(mapping.layout): mapping for mapping in csv_mappings}
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __repr__(self):
+        return f"<Layout fields={len(self.fields)} width={self.width}>"
+
+    def field(self, name):
+        """Return the Field for name (its last occurrence), or None."""
+        ordinal = self.index.get(name)
+        return None if ordinal is None else self.fields[ordinal]
+
+    def offset_of(self, name):
+        """Return the (start, end) range of a field by name, or None."""
+        ordinal = self.index.get(name)
+        return None if ordinal is None else self.slices[ordinal]
+
+    def resolve(self, key):
+        """
+        Return the ordinals of the field a key names, or None.
+
+        Keys match a field name exactly, after case-folding and collapsing
+        punctuation, or through a synonym added with add_aliases. ``aliases``
+        only holds the names from config.csv and aliases.csv, so arbitrary
+        input keys never grow it; normalize_name keeps a bounded cache of
+        the spellings it has seen.
+        """
+        found = self.aliases.get(key)
+        if found is None:
+            found = self.aliases.get(normalize_name(key))
+        return found
+
+    def add_aliases(self, pairs):
+        """
+        Add synonyms for field names.
+
+        Args:
+            pairs (iterable): (alias, field name) pairs.
+
+        Raises:
+            ValueError: If a synonym names a field missing from the layout.
+        """
+        for alias, name in pairs:
+            found = self.ordinals.get(name)
+            if found is None:
+                raise ValueError(f"Alias {alias} refers to unknown field {name}")
+            self.aliases[alias] = found
+            self.aliases[normalize_name(alias)] = found
+
+    def effective_date(self, line):
+        """Return the parsed Effective Date of a line, or None."""
+        bounds = self.offset_of(EFFECTIVE_DATE_FIELD)
+        return None if bounds is None else parse_date(line[bounds[0]:bounds[1]])
+
+    def layout_for_line(self, line):
+        """Return the layout of a line; a single layout always returns itself."""
+        return self
+
+    @classmethod
+    def from_rows(cls, rows, length_column='length'):
+        """
+        Compile a layout from dict rows such as those from csv.DictReader.
+
+        Args:
+            rows (iterable): Mappings with order, name, length column and alignment.
+            length_column (str): Name of the width column ('length' or 'output_length').
+
+        Returns:
+            Layout: The compiled layout.
+        """
+        parsed = []
+        for row in rows:
+            name = (row.get('name') or '').strip()
+            if not name:
+                continue
+            length = int(row[length_column])
+            alignment = (row.get('alignment') or 'left').strip().lower()
+            if length > 0 and alignment not in ('left', 'right'):
+                raise ValueError(f"Invalid alignment for field {name}: {alignment}")
+            parsed.append((
+                int(row['order']), name, length, alignment,
+                (row.get('action_type') or 'all').strip(),
+                (row.get('not_in_eval') or 'false').strip().lower() == 'true',
+                (row.get('json_priority') or 'admissions').strip(),
+            ))
+        # A stable sort keeps file order for equal order numbers, like sort_values
+        parsed.sort(key=lambda item: item[0])
+
+        fields = []
+        offset = 0
+        for ordinal, (order, name, length, alignment, action_type, not_in_eval, priority) in enumerate(parsed):
+            fields.append(Field(ordinal, order, name, length, offset, alignment,
+                                action_type, not_in_eval, priority))
+            offset += length
+        return cls(fields)
+
+
+def _read_layout(path, required_columns, length_column):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = reader.fieldnames or []
+        if not all(col in columns for col in required_columns):
+            raise ValueError(f"{path} must contain columns: {', '.join(required_columns)}")
+        return Layout.from_rows(reader, length_column=length_column)
+
+
+def load_aliases(path=ALIASES_FILE):
+    """Load (alias, field name) pairs from aliases.csv."""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        if not all(col in (reader.fieldnames or []) for col in ALIASES_COLUMNS):
+            raise ValueError(f"{path} must contain columns: {', '.join(ALIASES_COLUMNS)}")
+        return [(row['alias'].strip(), row['field'].strip()) for row in reader if (row['alias'] or '').strip()]
+
+
+def load_layout(path='config.csv'):
+    """
+    Load and compile the CCAR record layout from config.csv.
+
+    Synonyms in an aliases.csv next to config.csv are added when it exists.
+    """
+    layout = _read_layout(path, CONFIG_COLUMNS, 'length')
+    aliases_path = os.path.join(os.path.dirname(path), ALIASES_FILE)
+    if os.path.exists(aliases_path):
+        layout.add_aliases(load_aliases(aliases_path))
+    return layout
+
+
+def load_csv_layout(path='csvToFL.csv'):
+    """Load and compile the CSV column layout from csvToFL.csv."""
+    return _read_layout(path, CSV_TO_FL_COLUMNS, 'output_length')
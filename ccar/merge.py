@@ -0,0 +1,37 @@
+"""Merging of admission and discharge records by json_priority."""
+
+
+def merge_json_by_priority(json1, json2, layout):
+    """
+    Merge two field dictionaries using each field's json_priority.
+
+    Values from json2 fill fields that are missing or empty in json1. When both
+    have a value, json2 only wins for fields whose priority is 'discharge'.
+
+    Args:
+        json1 (dict): Base record, usually the admission.
+        json2 (dict): Record merged on top, usually the discharge.
+        layout (Layout): Compiled layout from config.csv.
+
+    Returns:
+        dict: The merged fields.
+    """
+    # Create a copy of the first JSON as the base
+    merged_json = json1.copy()
+    priorities = layout.priorities
+
+    for field_name, value in json2.items():
+        # Skip empty values
+        if not value:
+            continue
+
+        # If field exists in json1 and has value, check priority
+        if json1.get(field_name):
+            # Default to 'admissions' if json_priority not specified
+            if priorities.get(field_name, 'admissions') == 'discharge':
+                merged_json[field_name] = value
+        else:
+            # If field doesn't exist in json1 or has no value, use json2's value
+            merged_json[field_name] = value
+
+    return merged_json
@@ -0,0 +1,164 @@
+"""Parallel CSV to fixed-length conversion over record-aligned byte ranges."""
+import csv
+import io
+import os
+import re
+
+from .csvmap import csv_mapping
+from .formatter import format_csv_row
+from .rules import apply_compiled_rules, compile_rules
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+_SCAN_BLOCK_SIZE = 1024 * 1024
+
+# Set once per worker process by _init_worker
+_worker_config = None
+
+
+# A quote that opens a quoted field: the first character of a field. Quotes
+# elsewhere in an unquoted field are literal characters, as in 5'10".
+_OPENING_QUOTE = re.compile(rb'"(?<![^,\r\n]")')
+# The rest of a quoted field up to its closing quote; "" is an escaped quote,
+# so a closing quote is never followed by another quote
+_QUOTED_FIELD_END = re.compile(rb'[^"]*(?:""[^"]*)*"(?!")')
+
+
+def _scan_boundaries(blocks, size, chunk_size):
+    # Shared by the file and buffer variants; blocks are consecutive bytes-like
+    # pieces and reading stops as soon as the last boundary is found.
+    boundaries = [0]
+    target = chunk_size
+    blocks = iter(blocks)
+    buffer = b''
+    base = 0  # Offset of buffer[0] in the input
+    scan = 0  # Position in buffer known to be outside any quoted field
+
+    while target < size:
+        opening = _OPENING_QUOTE.search(buffer, scan)
+        unquoted_end = opening.start() if opening else len(buffer)
+        newline = buffer.find(b'\n', max(scan, target - base), unquoted_end)
+        if newline >= 0:
+            boundary = base + newline + 1
+            if boundary < size:
+                boundaries.append(boundary)
+            target = boundary + chunk_size
+            scan = newline + 1
+            continue
+        if opening:
+            closing = _QUOTED_FIELD_END.match(buffer, opening.end())
+            # A quote at the very end may be the first of an escaped pair
+            if closing and closing.end() < len(buffer):
+                scan = closing.end()
+                continue
+            scan = opening.start()
+        else:
+            scan = len(buffer)
+
+        block = next(blocks, b'')
+        if not block:
+            break
+        # Keep the byte before scan for the opening-quote lookbehind
+        keep = max(scan - 1, 0)
+        buffer = buffer[keep:] + block
+        base += keep
+        scan -= keep
+
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def find_chunk_boundaries(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Split a CSV file into byte ranges that start and end on record boundaries.
+
+    A newline only ends a record when it is outside a quoted field. As in
+    csv.reader, a field is quoted only when its first character is a quote;
+    inside it "" is an escaped quote, and a quote anywhere in an unquoted
+    field (5'10") is a literal character. Quoted fields are skipped with a
+    regular expression, so the file is scanned once in blocks in C.
+
+    Args:
+        path (str): CSV file path.
+        chunk_size (int): Target size of each range in bytes.
+
+    Returns:
+        list: (start, end) byte ranges covering the whole file, in order.
+    """
+    with open(path, 'rb') as f:
+        blocks = iter(lambda: f.read(_SCAN_BLOCK_SIZE), b'')
+        return _scan_boundaries(blocks, os.path.getsize(path), chunk_size)
+
+
+def split_csv_bytes(data, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Split in-memory CSV bytes into record-aligned chunks, like find_chunk_boundaries."""
+    blocks = (data[start:start + _SCAN_BLOCK_SIZE] for start in range(0, len(data), _SCAN_BLOCK_SIZE))
+    return [data[start:end] for start, end in _scan_boundaries(blocks, len(data), chunk_size)]
+
+
+def _init_worker(csv_layout, layout, rules):
+    global _worker_config
+    _worker_config = (csv_layout, layout, rules)
+
+
+def _convert_rows(rows, csv_layout, layout, rules):
+    if layout is None:
+        return [format_csv_row(row, csv_layout) for row in rows]
+    mapping = csv_mapping(csv_layout, layout)
+    compiled = compile_rules(rules, layout)
+    return [apply_compiled_rules(mapping.record_from_row(row), compiled).to_line() for row in rows]
+
+
+def _convert_chunk(task):
+    path, start, end, newline = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    text = data.decode('utf-8-sig' if start == 0 else 'utf-8')
+    lines = _convert_rows(csv.reader(io.StringIO(text)), *_worker_config)
+    return ''.join(line + newline for line in lines), len(lines)
+
+
+def process_csv_file_to_fixed_length(input_path, output_path, csv_layout, layout=None, rules=None,
+                                     workers=None, chunk_size=DEFAULT_CHUNK_SIZE, newline='\r\n'):
+    """
+    Convert a large headerless CSV file into a .car file using a process pool.
+
+    The input is split into record-aligned byte ranges which workers read and
+    format independently; results are written back in input order. The
+    layouts are sent to each worker once, when it starts. Inputs that fit in
+    a single chunk are converted in-process.
+
+    Args:
+        input_path (str): Headerless CSV file.
+        output_path (str): .car file to write.
+        csv_layout (Layout): Compiled layout from csvToFL.csv.
+        layout (Layout): Optional layout from config.csv. When given, each row
+            is also parsed, run through rules and reformatted, like the app does.
+        rules (list): Rule dictionaries used with layout.
+        workers (int): Worker processes, defaults to the CPU count.
+        chunk_size (int): Target bytes per chunk.
+        newline (str): Line terminator written after every record.
+
+    Returns:
+        int: Number of records written.
+    """
+    chunks = find_chunk_boundaries(input_path, chunk_size)
+    tasks = [(input_path, start, end, newline) for start, end in chunks]
+    config = (csv_layout, layout, rules or [])
+    count = 0
+
+    with open(output_path, 'w', encoding='utf-8', newline='') as out:
+        if len(tasks) <= 1 or workers == 1:
+            _init_worker(*config)
+            results = map(_convert_chunk, tasks)
+            for text, lines in results:
+                out.write(text)
+                count += lines
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=config) as pool:
+                for text, lines in pool.map(_convert_chunk, tasks):
+                    out.write(text)
+                    count += lines
+    return count
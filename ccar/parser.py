@@ -0,0 +1,45 @@
+"""Parsing of fixed-width CCAR text into field dictionaries."""
+
+
+def parse_fixed_width_text(text, layout):
+    """
+    Parse fixed-width text based on the layout specifications.
+
+    Args:
+        text (str): A fixed-width CCAR record.
+        layout (Layout): Compiled layout from config.csv.
+
+    Returns:
+        dict: Field names mapped to their stripped, non-empty values.
+    """
+    fields = {}
+    text = text.strip()
+
+    if not text:
+        return fields
+
+    text_length = len(text)
+    for field, (start, end) in zip(layout.fields, layout.slices):
+        if start >= text_length:
+            # We've reached the end of the text
+            break
+        value = text[start:end].strip()
+        # Store non-empty values
+        if value:
+            fields[field.name] = value
+
+    return fields
+
+
+def split_fixed_width(line, layout):
+    """
+    Split a fixed-width line into its raw field values, spaces included.
+
+    Args:
+        line (str): A fixed-width CCAR record.
+        layout (Layout): Compiled layout from config.csv.
+
+    Returns:
+        list: One string per field, in layout order.
+    """
+    return [line[start:end] for start, end in layout.slices]
@@ -0,0 +1,172 @@
+"""End-to-end conversion of CNAI output, CSV and fixed-width text into CCAR lines."""
+import csv
+import io
+import json
+
+from .csvmap import csv_mapping
+from .record import Record, merge_records
+from .rules import apply_compiled_rules, compile_rules
+
+INPUT_FORMATS = ('auto', 'json', 'jsonl', 'csv', 'fixed')
+
+
+def detect_format(text):
+    """Guess the input format of text: json, jsonl, csv or fixed."""
+    stripped = text.strip()
+    if stripped.startswith('{') and '\n' in stripped and stripped.rstrip().endswith('}'):
+        first_line = stripped.split('\n', 1)[0].strip()
+        if first_line.startswith('{') and first_line.endswith('}'):
+            return 'jsonl'
+    if '{' in stripped:
+        return 'json'
+    if ',' in stripped:
+        return 'csv'
+    return 'fixed'
+
+
+def parse_json_record(text):
+    """Parse a JSON object, ignoring any text before its opening brace."""
+    if '{' in text:
+        text = text[text.find('{'):]
+    fields = json.loads(text)
+    if not isinstance(fields, dict):
+        raise ValueError("JSON input must be a dictionary")
+    return fields
+
+
+def _iter_json(text, input_format):
+    if input_format == 'json':
+        yield parse_json_record(text)
+    else:
+        for line in text.splitlines():
+            if line.strip():
+                yield parse_json_record(line)
+
+
+def iter_records(text, input_format, layout, csv_layout, unknown=None):
+    """
+    Parse input text into records, one per JSON object, CSV row or line.
+
+    Args:
+        text (str): Input text.
+        input_format (str): One of INPUT_FORMATS.
+        layout (Layout): Compiled layout from config.csv.
+        csv_layout (Layout): Compiled layout from csvToFL.csv.
+        unknown (list): Optional; JSON keys that name no field are appended.
+
+    Yields:
+        Record: Records of layout.
+    """
+    if input_format == 'auto':
+        input_format = detect_format(text)
+
+    if input_format in ('json', 'jsonl'):
+        for fields in _iter_json(text, input_format):
+            yield Record.from_dict(fields, layout, unknown)
+    elif input_format == 'csv':
+        yield from csv_mapping(csv_layout, layout).records_from_text(text)
+    elif input_format == 'fixed':
+        for line in text.splitlines():
+            if line.strip():
+                yield Record.parse(line, layout)
+    else:
+        raise ValueError(f"Unknown input format: {input_format}")
+
+
+def convert_record(record, rules, secondary=None, stats=None):
+    """
+    Merge, apply rules to and format one record.
+
+    Args:
+        record (Record): The primary record; rules update it in place.
+        rules (list): Rule dictionaries from rules.json.
+        secondary (Record): Optional record merged on top by json_priority.
+        stats (RuleStats): Optional collector of rule firing counts.
+
+    Returns:
+        str: The fixed-width CCAR line.
+    """
+    if secondary is not None:
+        record = merge_records(record, secondary)
+    apply_compiled_rules(record, compile_rules(rules, record.layout), stats)
+    return record.to_line()
+
+
+def convert_fields(fields, layout, rules, secondary=None):
+    """Like convert_record, for dicts keyed by field name."""
+    record = Record.from_dict(fields, layout)
+    if secondary:
+        secondary = Record.from_dict(secondary, layout)
+    return convert_record(record, rules, secondary or None)
+
+
+def convert_text(text, input_format, layout, csv_layout, rules, stats=None, unknown=None):
+    """Convert every record in text into fixed-width CCAR lines."""
+    return [convert_record(record, rules, stats=stats)
+            for record in iter_records(text, input_format, layout, csv_layout, unknown)]
+
+
+def iter_versioned_records(text, input_format, registry, unknown=None):
+    """
+    Parse input text whose records may span several layout versions.
+
+    Every record is parsed with the layout version selected by its own
+    Effective Date, so mixed-era input is handled in a single pass.
+
+    Args:
+        text (str): Input text.
+        input_format (str): One of INPUT_FORMATS.
+        registry (LayoutRegistry): Compiled layout versions.
+        unknown (list): Optional; JSON keys that name no field are appended.
+
+    Yields:
+        tuple: (LayoutVersion, Record) for each record.
+    """
+    if input_format == 'auto':
+        input_format = detect_format(text)
+
+    if input_format in ('json', 'jsonl'):
+        for fields in _iter_json(text, input_format):
+            version = registry.version_for_fields(fields)
+            yield version, Record.from_dict(fields, version.layout, unknown)
+    elif input_format == 'csv':
+        try:
+            rows = list(csv.reader(io.StringIO(text)))
+        except csv.Error as e:
+            raise ValueError(f"Error parsing CSV: {e}") from e
+        if not rows:
+            raise ValueError("CSV input is empty")
+        for row in rows:
+            version = registry.version_for_csv_row(row)
+            yield version, csv_mapping(version.csv_layout, version.layout).record_from_row(row)
+    elif input_format == 'fixed':
+        for line in text.splitlines():
+            if line.strip():
+                version = registry.version_for_line(line)
+                yield version, Record.parse(line, version.layout)
+    else:
+        raise ValueError(f"Unknown input format: {input_format}")
+
+
+def convert_versioned_text(text, input_format, registry, target=None, stats=None, unknown=None):
+    """
+    Convert mixed-era input into fixed-width lines in one pass.
+
+    Args:
+        text (str): Input text.
+        input_format (str): One of INPUT_FORMATS.
+        registry (LayoutRegistry): Compiled layout versions.
+        target (LayoutVersion): Optional version to re-export every record
+            into. By default each record keeps the layout of its own era.
+        stats (RuleStats): Optional collector of rule firing counts.
+        unknown (list): Optional; JSON keys that name no field are appended.
+
+    Returns:
+        list: Fixed-width CCAR lines.
+    """
+    lines = []
+    for version, record in iter_versioned_records(text, input_format, registry, unknown):
+        if target is not None:
+            record = record.to_layout(target.layout)
+        lines.append(convert_record(record, (target or version).rules, stats=stats))
+    return lines
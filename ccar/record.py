@@ -0,0 +1,170 @@
+"""Compact CCAR records stored as value lists indexed by field ordinal."""
+from .encoding import transliterate
+
+
+class Record:
+    """
+    One CCAR record backed by a list with one value per layout field.
+
+    Field names are resolved to ordinals once, by the layout, so records only
+    hold a reference to their layout and a list of strings. Empty fields are
+    stored as ''.
+
+    A few field names occur more than once in config.csv. Reading such a name
+    returns the value of its last non-empty occurrence and writing it sets
+    every occurrence, which is how a dict keyed by field name behaved.
+    from_line keeps each occurrence's own value, so an exact line round-trips;
+    parse and merge_records collapse them to one value like the dict did.
+    """
+
+    __slots__ = ('layout', 'values')
+
+    def __init__(self, layout, values=None):
+        self.layout = layout
+        self.values = values if values is not None else [''] * len(layout.fields)
+
+    @classmethod
+    def from_line(cls, line, layout):
+        """Split an exact fixed-width line into a record, stripping each value."""
+        return cls(layout, [line[start:end].strip() for start, end in layout.slices])
+
+    @classmethod
+    def parse(cls, text, layout):
+        """
+        Parse fixed-width text the way parse_fixed_width_text does.
+
+        Every occurrence of a repeated field name gets the value of its last
+        non-empty occurrence, as in the dict parse_fixed_width_text returns.
+        """
+        record = cls.from_line(text.strip(), layout)
+        values = record.values
+        for ordinals in layout.repeated:
+            value = _last_value(values, ordinals)
+            for ordinal in ordinals:
+                values[ordinal] = value
+        return record
+
+    @classmethod
+    def from_dict(cls, fields, layout, unknown=None):
+        """
+        Build a record from a dict keyed by field name or alias.
+
+        Keys are resolved through layout.aliases. Keys that name no field are
+        skipped and, when an unknown list is given, appended to it.
+        """
+        record = cls(layout)
+        aliases = layout.aliases
+        values = record.values
+        for name, value in fields.items():
+            found = aliases.get(name)
+            if found is None:
+                found = layout.resolve(name)
+                if found is None:
+                    if unknown is not None:
+                        unknown.append(name)
+                    continue
+            value = '' if value is None else str(value).strip()
+            for ordinal in found:
+                values[ordinal] = value
+        return record
+
+    def copy(self):
+        return Record(self.layout, self.values[:])
+
+    def to_layout(self, layout):
+        """Return the record in another layout version, matching fields by name."""
+        if layout is self.layout:
+            return self
+        return Record.from_dict(self.to_dict(), layout)
+
+    def get(self, name, default=''):
+        """Return a field's value by name."""
+        values = self.values
+        for ordinal in reversed(self.layout.ordinals.get(name, ())):
+            if values[ordinal]:
+                return values[ordinal]
+        return default
+
+    def set(self, name, value):
+        """Set every occurrence of a field by name."""
+        for ordinal in self.layout.ordinals[name]:
+            self.values[ordinal] = value
+
+    def __getitem__(self, ordinal):
+        return self.values[ordinal]
+
+    def __setitem__(self, ordinal, value):
+        self.values[ordinal] = value
+
+    def __eq__(self, other):
+        return isinstance(other, Record) and self.layout is other.layout and self.values == other.values
+
+    def __repr__(self):
+        filled = sum(1 for value in self.values if value)
+        return f"<Record {filled}/{len(self.values)} fields set>"
+
+    def to_dict(self):
+        """Return non-empty values keyed by field name, later occurrences winning."""
+        return {name: value for name, value in zip(self.layout.names, self.values) if value}
+
+    def to_line(self):
+        """
+        Format the record as a fixed-width line of exactly layout.width characters.
+
+        Non-ASCII characters are transliterated before padding, so the line is
+        also exactly layout.width bytes once encoded.
+        """
+        parts = []
+        for value, (length, right, strip_periods) in zip(self.values, self.layout.formats):
+            value = value.strip()
+            if not value.isascii():
+                value = transliterate(value)
+            if strip_periods:
+                value = value.replace(".", "")
+            value = value[:length]
+            parts.append(value.rjust(length) if right else value.ljust(length))
+        return ''.join(parts)
+
+    def to_bytes(self):
+        """Encode the record as exactly layout.width ASCII bytes."""
+        return self.to_line().encode('ascii')
+
+
+def _last_value(values, ordinals):
+    # The value a dict keyed by field name would hold: the last non-empty one
+    for ordinal in reversed(ordinals):
+        if values[ordinal]:
+            return values[ordinal]
+    return ''
+
+
+def merge_records(base, other):
+    """
+    Merge two records of the same layout by each field's json_priority.
+
+    Works like merge_json_by_priority on field ordinals: values from other
+    fill empty fields of base, and replace non-empty ones only for fields with
+    'discharge' priority. A repeated field name is merged once, as the dict
+    merge did: both records' values are read as Record.get reads them, the
+    name's priority is that of its last occurrence (Layout.priorities), and
+    the result is written to every occurrence.
+
+    Args:
+        base (Record): Base record, usually the admission.
+        other (Record): Record merged on top, usually the discharge.
+
+    Returns:
+        Record: A new merged record.
+    """
+    layout = base.layout
+    merged = [
+        new if new and (not old or discharge) else old
+        for old, new, discharge in zip(base.values, other.values, layout.discharge_priority)
+    ]
+    for ordinals in layout.repeated:
+        old = _last_value(base.values, ordinals)
+        new = _last_value(other.values, ordinals)
+        value = new if new and (not old or layout.discharge_priority[ordinals[-1]]) else old
+        for ordinal in ordinals:
+            merged[ordinal] = value
+    return Record(layout, merged)
@@ -0,0 +1,180 @@
+"""Registry of layout versions selected by a record's Effective Date."""
+import csv
+import os
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime
+
+from .layout import ALIASES_FILE, EFFECTIVE_DATE_FIELD, load_csv_layout, load_layout, parse_date
+from .rules import load_rules
+
+# Name of the Effective Date column in csvToFL.csv
+CSV_EFFECTIVE_DATE_COLUMN = 'effective_date'
+
+REGISTRY_COLUMNS = ['name', 'effective_from', 'effective_to', 'config', 'csv_to_fl']
+
+LayoutVersion = namedtuple('LayoutVersion', [
+    'name', 'effective_from', 'effective_to', 'layout', 'csv_layout', 'rules',
+])
+
+
+class LayoutRegistry:
+    """
+    Compiled layout versions, each covering an Effective Date range.
+
+    Ranges are inclusive and open-ended when a bound is None. The registry
+    offers the same effective_date and layout_for_line methods as a single
+    Layout, so batch helpers accept either.
+    """
+
+    def __init__(self, versions):
+        if not versions:
+            raise ValueError("A layout registry needs at least one version")
+        self.versions = tuple(sorted(versions, key=lambda v: v.effective_from or datetime.min))
+        for earlier, later in zip(self.versions, self.versions[1:]):
+            if earlier.effective_to is None or earlier.effective_to >= (later.effective_from or datetime.min):
+                raise ValueError(f"Layout versions {earlier.name} and {later.name} overlap")
+        self._starts = [v.effective_from or datetime.min for v in self.versions]
+        self.current = self.versions[-1]
+        # Raw Effective Date text -> version, so each distinct date is parsed
+        # once. Only values that parse as dates are kept, so malformed input
+        # cannot grow it.
+        self._by_value = {}
+        # Newest first: the most likely match for new records is tried first
+        self._probes = [(v, v.layout.offset_of(EFFECTIVE_DATE_FIELD)) for v in reversed(self.versions)]
+        self._csv_probes = [(v, v.csv_layout.index.get(CSV_EFFECTIVE_DATE_COLUMN)) for v in reversed(self.versions)]
+
+    def __len__(self):
+        return len(self.versions)
+
+    def __repr__(self):
+        return f"<LayoutRegistry versions={[v.name for v in self.versions]}>"
+
+    def version_for_date(self, date):
+        """Return the version whose range contains date, or None."""
+        position = bisect_right(self._starts, date) - 1
+        if position < 0:
+            return None
+        version = self.versions[position]
+        if version.effective_to is not None and date > version.effective_to:
+            return None
+        return version
+
+    def version_for_value(self, value):
+        """Return the version for a raw MMDDYYYY Effective Date, or None."""
+        try:
+            return self._by_value[value]
+        except KeyError:
+            date = parse_date(value)
+            if date is None:
+                return None
+            version = self._by_value[value] = self.version_for_date(date)
+            return version
+
+    def version_for_fields(self, fields):
+        """Return the version for a field dictionary, defaulting to the current one."""
+        value = fields.get(EFFECTIVE_DATE_FIELD)
+        version = self.version_for_value(str(value).strip()) if value else None
+        return version or self.current
+
+    def version_for_line(self, line):
+        """
+        Return the version a fixed-width line was written with.
+
+        Each version's Effective Date offset is probed and the first version
+        whose range contains the date found at its own offset wins. Lines
+        without a usable date fall back to the current version.
+        """
+        for version, bounds in self._probes:
+            if bounds is not None and self.version_for_value(line[bounds[0]:bounds[1]]) is version:
+                return version
+        return self.current
+
+    def version_for_csv_row(self, row):
+        """Return the version a parsed CSV row was written with, like version_for_line."""
+        for version, column in self._csv_probes:
+            if column is not None and column < len(row) and self.version_for_value(row[column].strip()) is version:
+                return version
+        return self.current
+
+    def layout_for_line(self, line):
+        """Return the layout a fixed-width line was written with."""
+        return self.version_for_line(line).layout
+
+    def effective_date(self, line):
+        """Return the parsed Effective Date of a line, or None."""
+        return self.layout_for_line(line).effective_date(line)
+
+
+def load_registry(path='layouts.csv'):
+    """
+    Load and compile every layout version listed in a registry file.
+
+    Paths in the file are relative to its directory. Each distinct config,
+    csvToFL and rules file is loaded once even if several versions share it.
+
+    Args:
+        path (str): Registry CSV with name, effective_from, effective_to,
+            config, csv_to_fl and optional rules columns. Dates are MMDDYYYY.
+
+    Returns:
+        LayoutRegistry: The compiled registry.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    loaded = {}
+
+    def cached(loader, file_name):
+        file_path = os.path.join(base, file_name)
+        key = (loader, file_path)
+        if key not in loaded:
+            loaded[key] = loader(file_path)
+        return loaded[key]
+
+    def bound(value):
+        value = (value or '').strip()
+        if not value:
+            return None
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"{path}: invalid date {value!r}, expected MMDDYYYY")
+        return date
+
+    versions = []
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        if not all(col in (reader.fieldnames or []) for col in REGISTRY_COLUMNS):
+            raise ValueError(f"{path} must contain columns: {', '.join(REGISTRY_COLUMNS)}")
+        for row in reader:
+            versions.append(LayoutVersion(
+                row['name'].strip(),
+                bound(row['effective_from']),
+                bound(row['effective_to']),
+                cached(load_layout, row['config'].strip()),
+                cached(load_csv_layout, row['csv_to_fl'].strip()),
+                cached(load_rules, (row.get('rules') or 'rules.json').strip()),
+            ))
+    return LayoutRegistry(versions)
+
+
+def registry_sources(path='layouts.csv'):
+    """
+    List the files a registry is compiled from.
+
+    These are the registry file itself, every config, csvToFL and rules file
+    it names, and the aliases.csv next to each config.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    sources = [os.path.abspath(path)]
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            config = os.path.join(base, (row.get('config') or '').strip())
+            sources.append(config)
+            sources.append(os.path.join(os.path.dirname(config), ALIASES_FILE))
+            sources.append(os.path.join(base, (row.get('csv_to_fl') or '').strip()))
+            sources.append(os.path.join(base, (row.get('rules') or 'rules.json').strip()))
+    return list(dict.fromkeys(sources))
+
+
+def single_version_registry(layout, csv_layout, rules, name='current'):
+    """Wrap one layout pair in an open-ended registry."""
+    return LayoutRegistry([LayoutVersion(name, None, None, layout, csv_layout, rules)])
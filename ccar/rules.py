@@ -0,0 +1,350 @@
+"""Conditional field rules loaded from rules.json."""
+import json
+import time
+from collections import namedtuple
+
+
+def load_rules(path='rules.json'):
+    """Load the list of rule dictionaries from rules.json."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def apply_rules(fields, rules):
+    """
+    Apply conditional rules to update field values.
+
+    Args:
+        fields (dict): Dictionary of field names and their current values.
+        rules (list): List of rule dictionaries from rules.json.
+
+    Returns:
+        dict: Updated fields dictionary after applying all rules.
+    """
+    for rule in rules:
+        if 'target' not in rule:
+            continue  # Skip any object without a 'target' key
+        target = rule['target']
+        default = rule.get('default', None)
+        for cv in rule.get('conditions_values', []):
+            # Check if all conditions match current field values
+            if all(fields.get(cond_field) == cond_value for cond_field, cond_value in cv['conditions'].items()):
+                fields[target] = cv['value']
+                break
+        else:
+            # Apply default value if no conditions match and default is specified
+            if default is not None:
+                fields[target] = default
+    return fields
+
+
+CompiledRule = namedtuple('CompiledRule', ['target', 'targets', 'branches', 'default', 'index', 'branch_index'])
+
+
+def compile_rules(rules, layout):
+    """
+    Resolve the field names in rules to layout ordinals.
+
+    Each rule becomes a CompiledRule whose targets are ordinals and whose
+    branches are (conditions, value) pairs, conditions being (ordinal,
+    expected) pairs; index and branch_index give the positions of the rule and
+    of each kept branch in rules.json. Field names are resolved with
+    layout.resolve, so aliases are accepted. Names that occur more than once in the layout keep a
+    tuple of their ordinals, last first. Branches that test a field missing
+    from the layout can never match and are dropped, as are rules whose target
+    is missing. The result is cached on the layout per rules list.
+
+    Args:
+        rules (list): Rule dictionaries from rules.json.
+        layout (Layout): Compiled layout from config.csv.
+
+    Returns:
+        tuple: CompiledRule entries in rule order.
+    """
+    cached = layout._compiled_rules.get(id(rules))
+    if cached is not None and cached[0] is rules:
+        return cached[1]
+
+    def resolve(name):
+        found = layout.resolve(name)
+        if found is None or len(found) == 1:
+            return found and found[0]
+        return tuple(reversed(found))
+
+    compiled = []
+    for index, rule in enumerate(rules):
+        if 'target' not in rule:
+            continue  # Skip any object without a 'target' key
+        targets = layout.resolve(rule['target'])
+        if targets is None:
+            continue
+        branches = []
+        branch_index = []
+        for position, cv in enumerate(rule.get('conditions_values', [])):
+            conditions = tuple((resolve(name), value) for name, value in cv['conditions'].items())
+            if all(ordinal is not None for ordinal, _ in conditions):
+                branches.append((conditions, cv['value']))
+                branch_index.append(position)
+        compiled.append(CompiledRule(rule['target'], targets, tuple(branches), rule.get('default', None),
+                                     index, tuple(branch_index)))
+
+    compiled = tuple(compiled)
+    layout._compiled_rules[id(rules)] = (rules, compiled)
+    return compiled
+
+
+def _matches(values, conditions):
+    for ordinal, expected in conditions:
+        if ordinal.__class__ is int:
+            actual = values[ordinal]
+        else:
+            # A repeated field name reads its last non-empty occurrence
+            actual = next((values[o] for o in ordinal if values[o]), '')
+        if actual != expected:
+            return False
+    return True
+
+
+def apply_compiled_rules(record, compiled, stats=None):
+    """
+    Apply compiled rules to a Record in place, like apply_rules does to a dict.
+
+    Args:
+        record (Record): The record to update.
+        compiled (tuple): Output of compile_rules for the record's layout.
+        stats (RuleStats): Optional collector of firing counts and timings.
+
+    Returns:
+        Record: The same record.
+    """
+    if stats is not None:
+        return stats.apply(record, compiled)
+    values = record.values
+    for rule in compiled:
+        for conditions, value in rule.branches:
+            if _matches(values, conditions):
+                break
+        else:
+            value = rule.default
+            if value is None:
+                continue
+        for ordinal in rule.targets:
+            values[ordinal] = value
+    return record
+
+
+RuleReport = namedtuple('RuleReport', ['index', 'target', 'branch_index', 'branch_hits', 'default_hits',
+                                       'misses', 'seconds'])
+
+
+class RuleStats:
+    """
+    Firing counts and time spent per compiled rule.
+
+    Pass an instance to apply_compiled_rules (or convert_record) for every
+    record of a batch, or keep one for the life of a process; instances from
+    several workers can be combined with merge. For each rule it counts how
+    often each branch won, how often the default was written and how often
+    the rule left the record unchanged.
+
+    Counts are kept in lists parallel to each compiled rule tuple, so rules
+    are never hashed while records are applied and each layout version's
+    rules are counted separately.
+    """
+
+    def __init__(self):
+        self.records = 0
+        # id() of a compile_rules result -> (compiled, hits, seconds), with
+        # hits and seconds parallel to compiled
+        self.tables = {}
+
+    def _table(self, compiled):
+        table = self.tables.get(id(compiled))
+        if table is None:
+            # One slot per branch, then the default, then no change
+            table = self.tables[id(compiled)] = (
+                compiled, [[0] * (len(rule.branches) + 2) for rule in compiled], [0.0] * len(compiled))
+        return table
+
+    def apply(self, record, compiled):
+        """Instrumented equivalent of apply_compiled_rules."""
+        values = record.values
+        clock = time.perf_counter
+        self.records += 1
+        _, table_hits, table_seconds = self._table(compiled)
+        # Each rule's time runs from the previous reading of the clock
+        started = clock()
+        for slot, rule in enumerate(compiled):
+            for position, (conditions, value) in enumerate(rule.branches):
+                if _matches(values, conditions):
+                    break
+            else:
+                position = len(rule.branches)
+                value = rule.default
+                if value is None:
+                    position += 1
+            if position <= len(rule.branches):
+                for ordinal in rule.targets:
+                    values[ordinal] = value
+            table_hits[slot][position] += 1
+            finished = clock()
+            table_seconds[slot] += finished - started
+            started = finished
+        return record
+
+    def merge(self, other):
+        """
+        Add the counts and timings of another RuleStats to this one.
+
+        Tables are matched by equal compiled rules, as those of another
+        process are copies rather than the same objects.
+        """
+        self.records += other.records
+        for compiled, hits, seconds in other.tables.values():
+            mine = next((table for table in self.tables.values() if table[0] == compiled), None)
+            if mine is None:
+                mine = self._table(compiled)
+            for slot, rule_hits in enumerate(hits):
+                mine[1][slot] = [a + b for a, b in zip(mine[1][slot], rule_hits)]
+                mine[2][slot] += seconds[slot]
+        return self
+
+    def report(self):
+        """
+        Summarise the collected counts.
+
+        Returns:
+            list: RuleReport entries in rules.json order.
+        """
+        rows = []
+        for compiled, hits, seconds in self.tables.values():
+            for rule, rule_hits, rule_seconds in zip(compiled, hits, seconds):
+                rows.append(RuleReport(rule.index, rule.target, rule.branch_index, tuple(rule_hits[:-2]),
+                                       rule_hits[-2], rule_hits[-1], rule_seconds))
+        rows.sort(key=lambda row: row.index)
+        return rows
+
+
+RuleProblem = namedtuple('RuleProblem', ['index', 'target', 'message'])
+
+
+def _writes_always(rule):
+    return 'target' in rule and (rule.get('default') is not None or
+                                 any(not cv['conditions'] for cv in rule.get('conditions_values', [])))
+
+
+def check_rules(rules, layout):
+    """
+    Find rules and branches that can never change a record.
+
+    Reported are rules without a target or with a target missing from the
+    layout, branches that test a missing field, branches shadowed by an
+    earlier branch of the same rule whose conditions are a subset of theirs,
+    and rules whose target is always overwritten by a later rule before any
+    rule in between reads it.
+
+    Args:
+        rules (list): Rule dictionaries from rules.json.
+        layout (Layout): Compiled layout from config.csv.
+
+    Returns:
+        list: RuleProblem entries in rules.json order.
+    """
+    problems = []
+    for index, rule in enumerate(rules):
+        target = rule.get('target')
+        if target is None:
+            problems.append(RuleProblem(index, None, "has no target"))
+            continue
+        if layout.resolve(target) is None:
+            problems.append(RuleProblem(index, target, "target is not a field of the layout"))
+            continue
+
+        seen = []
+        for position, cv in enumerate(rule.get('conditions_values', [])):
+            conditions = cv['conditions']
+            missing = [name for name in conditions if layout.resolve(name) is None]
+            if missing:
+                problems.append(RuleProblem(index, target, f"branch {position} tests unknown field "
+                                                           f"{', '.join(missing)} and never matches"))
+                continue
+            shadow = next((earlier for earlier, items in seen if items <= conditions.items()), None)
+            if shadow is not None:
+                problems.append(RuleProblem(index, target, f"branch {position} is shadowed by branch {shadow}"))
+            seen.append((position, conditions.items()))
+
+        for later_index in range(index + 1, len(rules)):
+            later = rules[later_index]
+            if any(target in cv['conditions'] for cv in later.get('conditions_values', [])):
+                break
+            if later.get('target') == target and _writes_always(later):
+                problems.append(RuleProblem(index, target, f"is always overwritten by rule {later_index}"))
+                break
+    return problems
+
+
+def dead_rules(stats):
+    """
+    List the rules and branches that never fired in the records seen.
+
+    Args:
+        stats (RuleStats): Counts collected over a batch.
+
+    Returns:
+        list: RuleProblem entries in rules.json order.
+    """
+    problems = []
+    for row in stats.report():
+        if not any(row.branch_hits) and not row.default_hits:
+            problems.append(RuleProblem(row.index, row.target, "never fired"))
+            continue
+        for position, hits in zip(row.branch_index, row.branch_hits):
+            if not hits:
+                problems.append(RuleProblem(row.index, row.target, f"branch {position} never fired"))
+    return problems
+
+
+def format_rule_report(stats, problems=()):
+    """Render RuleStats and any RuleProblem entries as plain text."""
+    lines = [f"{stats.records} records"]
+    for row in stats.report():
+        branches = ', '.join(f"{position}:{hits}" for position, hits in zip(row.branch_index, row.branch_hits))
+        lines.append(f"rule {row.index} {row.target}: branches [{branches}] default {row.default_hits} "
+                     f"unchanged {row.misses} {row.seconds * 1000:.2f} ms")
+    for problem in problems:
+        lines.append(f"! rule {problem.index} {problem.target or ''}: {problem.message}")
+    return '\n'.join(lines)
+
+
+def _reads(rule):
+    for conditions, _ in rule.branches:
+        for ordinal, _ in conditions:
+            if ordinal.__class__ is int:
+                yield ordinal
+            else:
+                yield from ordinal
+
+
+def dependent_rules(compiled, ordinals):
+    """
+    Select the compiled rules that can change when some fields change.
+
+    A rule depends on a field when it writes that field, so an edit cannot
+    leave a value rules.json forbids, or when one of its conditions reads
+    it. Fields written by a selected rule count as changed for the rules
+    after it.
+
+    Args:
+        compiled (tuple): Output of compile_rules.
+        ordinals (iterable): Ordinals of the changed fields.
+
+    Returns:
+        tuple: The dependent rules, in rule order.
+    """
+    changed = set(ordinals)
+    selected = []
+    for rule in compiled:
+        if not changed.isdisjoint(rule.targets) or not changed.isdisjoint(_reads(rule)):
+            selected.append(rule)
+            changed.update(rule.targets)
+    return tuple(selected)
@@ -0,0 +1,259 @@
+"""Local HTTP conversion service backed by a bounded worker pool."""
+import json
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .layout import EFFECTIVE_DATE_FIELD
+from .parallel import split_csv_bytes
+from .pipeline import INPUT_FORMATS, convert_record, detect_format, iter_versioned_records
+from .record import Record, merge_records
+
+# Request Content-Types and the input format they imply; ?format= overrides
+CONTENT_TYPE_FORMATS = {
+    'application/json': 'json',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+    'text/csv': 'csv',
+    'text/plain': 'auto',
+}
+
+MAX_BODY_SIZE = 64 * 1024 * 1024
+RECORDS_PER_TASK = 500
+CSV_CHUNK_SIZE = 256 * 1024
+
+# Set once per worker process by _init_worker
+_registry = None
+
+
+def _init_worker(registry):
+    global _registry
+    _registry = registry
+
+
+def _convert_chunk(text, input_format):
+    return ''.join(convert_record(record, version.rules) + '\r\n'
+                   for version, record in iter_versioned_records(text, input_format, _registry))
+
+
+def _convert_merge(primary, secondary):
+    # The discharge record's Effective Date wins the merge, so it picks the layout
+    dated = secondary if secondary.get(EFFECTIVE_DATE_FIELD) else primary
+    version = _registry.version_for_fields(dated)
+    record = merge_records(Record.from_dict(primary, version.layout),
+                           Record.from_dict(secondary, version.layout))
+    return convert_record(record, version.rules) + '\r\n'
+
+
+class ConversionService:
+    """
+    Converts request bodies to .car lines on a shared process pool.
+
+    The compiled registry is sent to each worker once, when it starts. Each
+    request is split into tasks of a few hundred records which are submitted
+    through a sliding window, so a large request neither floods the pool nor
+    holds all of its output in memory. At most max_requests requests are
+    converted at a time.
+    """
+
+    def __init__(self, registry, workers=None, max_requests=4, max_body_size=MAX_BODY_SIZE):
+        self.registry = registry
+        self.workers = workers or os.cpu_count() or 1
+        # Spawned rather than forked, so workers do not inherit the listening
+        # socket and exit when the server process dies
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_worker, initargs=(registry,))
+        self.slots = threading.BoundedSemaphore(max_requests)
+        self.window = 2 * self.workers
+        self.max_body_size = max_body_size
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def tasks_for(self, body, input_format):
+        """
+        Split a request body into (function, args) tasks in record order.
+
+        Args:
+            body (bytes): The request body.
+            input_format (str): One of INPUT_FORMATS.
+
+        Returns:
+            list: Tasks for the worker pool.
+        """
+        if input_format == 'csv':
+            return [(_convert_chunk, (chunk.decode('utf-8-sig'), 'csv')) for chunk in split_csv_bytes(body, CSV_CHUNK_SIZE)]
+
+        text = body.decode('utf-8-sig')
+        if input_format == 'auto':
+            input_format = detect_format(text)
+        if input_format == 'csv':
+            return self.tasks_for(text.encode('utf-8'), 'csv')
+
+        if input_format == 'json':
+            fields = json.loads(text[text.find('{'):] if '{' in text else text)
+            if not isinstance(fields, dict):
+                raise ValueError("JSON input must be a dictionary")
+            # {"primary": {...}, "secondary": {...}} merges a discharge onto an admission
+            if isinstance(fields.get('primary'), dict):
+                return [(_convert_merge, (fields['primary'], fields.get('secondary') or {}))]
+            return [(_convert_chunk, (text, 'json'))]
+
+        lines = [line for line in text.splitlines() if line.strip()]
+        return [(_convert_chunk, ('\n'.join(lines[start:start + RECORDS_PER_TASK]), input_format))
+                for start in range(0, len(lines), RECORDS_PER_TASK)]
+
+    def stream(self, tasks):
+        """Run tasks on the pool and yield their output in task order."""
+        pending = []
+        tasks = iter(tasks)
+        try:
+            for function, args in tasks:
+                pending.append(self.pool.submit(function, *args))
+                if len(pending) >= self.window:
+                    yield pending.pop(0).result()
+            while pending:
+                yield pending.pop(0).result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP interface of the conversion service.
+
+    GET /health reports the loaded layout versions. POST /convert converts a
+    JSON record, JSON Lines, CSV or fixed-width body and streams back .car
+    lines with CRLF terminators using chunked transfer encoding.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'ccar'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        if data:
+            data = data.encode('utf-8')
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/health':
+            self._send_json(HTTPStatus.NOT_FOUND, {'error': "Not found"})
+            return
+        self._send_json(HTTPStatus.OK, {
+            'status': 'ok',
+            'layouts': [version.name for version in self.service.registry.versions],
+            'workers': self.service.workers,
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/convert':
+            self._send_json(HTTPStatus.NOT_FOUND, {'error': "Not found"})
+            return
+
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self.close_connection = True
+            self._send_json(HTTPStatus.LENGTH_REQUIRED, {'error': "Content-Length is required"})
+            return
+        if not (length.strip().isascii() and length.strip().isdigit()):
+            self.close_connection = True
+            self._send_json(HTTPStatus.BAD_REQUEST, {'error': "Content-Length must be a non-negative integer"})
+            return
+        length = int(length)
+        if length > self.service.max_body_size:
+            self.close_connection = True
+            self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            {'error': f"Body exceeds {self.service.max_body_size} bytes"})
+            return
+
+        content_type = (self.headers.get('Content-Type') or 'text/plain').split(';')[0].strip().lower()
+        input_format = parse_qs(url.query).get('format', [CONTENT_TYPE_FORMATS.get(content_type)])[0]
+        if input_format not in INPUT_FORMATS:
+            self.close_connection = True
+            self._send_json(HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+                            {'error': f"Unsupported input; use ?format= with one of {', '.join(INPUT_FORMATS)}"})
+            return
+
+        if not self.service.slots.acquire(timeout=1):
+            self.close_connection = True
+            self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {'error': "Too many concurrent requests"},
+                            {'Retry-After': '1'})
+            return
+        try:
+            self._convert(self.rfile.read(length), input_format)
+        finally:
+            self.service.slots.release()
+
+    def _convert(self, body, input_format):
+        try:
+            results = self.service.stream(self.service.tasks_for(body, input_format))
+            # Wait for the first task so input errors still get a proper status
+            first = next(results, '')
+        except ValueError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)})
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            self._write_chunk(first)
+            for text in results:
+                self._write_chunk(text)
+        except Exception as e:
+            # Headers are already sent: end without the final chunk so the
+            # client sees a truncated response rather than a short file
+            self.log_error("Conversion failed mid-stream: %s", e)
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class ConversionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        super().__init__(address, ConversionRequestHandler)
+        self.service = service
+
+
+def serve(registry, host='127.0.0.1', port=8765, workers=None, max_requests=4):
+    """Run the conversion service until interrupted."""
+    service = ConversionService(registry, workers=workers, max_requests=max_requests)
+    server = ConversionServer((host, port), service)
+    print(f"Serving CCAR conversions on http://{host}:{server.server_port} "
+          f"with {service.workers} workers", flush=True)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
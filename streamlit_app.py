@@ -1,76 +1,35 @@
 import streamlit as st
 import pandas as pd
+import io
 import json
-import os
-from csv_processor import process_csv_to_fixed_length, validate_csv_input
+from ccar import (
+    Archive, Batch, Record, batch_file_name, convert_record, diff_car, diff_rows, edit_line, encode_batch,
+    iter_versioned_records, lines_to_dataframe, load_registry_cached, merge_records, parse_fixed_width_text, partition_by_month,
+    read_car_lines, split_fixed_width, write_zip,
+)
 from additional_info_form import render_additional_info_form, generate_client_data, clear_form, initialize_form_data
 
-# Function to apply rules to fields
-def apply_rules(fields, rules):
-    """
-    Apply conditional rules to update field values.
-    
-    Args:
-        fields (dict): Dictionary of field names and their current values.
-        rules (list): List of rule dictionaries from rules.json.
-    
-    Returns:
-        dict: Updated fields dictionary after applying all rules.
-    """
-    for rule in rules:
-        if 'target' not in rule:
-            continue  # Skip any object without a 'target' key
-        target = rule['target']
-        conditions_values = rule.get('conditions_values', [])
-        default = rule.get('default', None)
-        for cv in conditions_values:
-            conditions = cv['conditions']
-            value = cv['value']
-            # Check if all conditions match current field values
-            if all(fields.get(cond_field) == cond_value for cond_field, cond_value in conditions.items()):
-                fields[target] = value
-                break
-        else:
-            # Apply default value if no conditions match and default is specified
-            if default is not None:
-                fields[target] = default
-    return fields
-
-# Load config and rules into session state if not already loaded
-if 'config_df' not in st.session_state:
+# Load the layout registry (config, csvToFL and rules per spec version) if not already loaded
+if 'registry' not in st.session_state:
     try:
-        st.session_state['config_df'] = pd.read_csv('config.csv')
-        required_columns = ['order', 'name', 'length', 'alignment']
-        if not all(col in st.session_state['config_df'].columns for col in required_columns):
-            st.error("config.csv must contain columns: order, name, length, alignment")
-            st.stop()
+        # Compiled layouts and rules are loaded from .ccar_cache when layouts.csv and its files are unchanged
+        st.session_state['registry'] = load_registry_cached('layouts.csv')
     except Exception as e:
-        st.error(f"Error loading config.csv: {e}")
+        st.error(f"Error loading layouts.csv: {e}")
         st.stop()
+registry = st.session_state['registry']
 
-# Load CSV to fixed-length configuration
-if 'csv_to_fl_config' not in st.session_state:
-    try:
-        st.session_state['csv_to_fl_config'] = pd.read_csv('csvToFL.csv')
-        required_columns = ['order', 'name', 'output_length', 'alignment']
-        if not all(col in st.session_state['csv_to_fl_config'].columns for col in required_columns):
-            st.error("csvToFL.csv must contain columns: order, name, output_length, alignment")
-            st.stop()
-    except Exception as e:
-        st.error(f"Error loading csvToFL.csv: {e}")
-        st.stop()
+# Initialize the batch of fixed-width lines if not present
+if 'batch' not in st.session_state:
+    st.session_state['batch'] = Batch()
 
-if 'rules' not in st.session_state:
-    try:
-        with open('rules.json', 'r') as f:
-            st.session_state['rules'] = json.load(f)
-    except Exception as e:
-        st.error(f"Error loading rules.json: {e}")
-        st.stop()
+# Downloaded batches are archived locally so discharges can find the client's admission.
+# Every session shares one Archive, which serialises its writes with a lock.
+@st.cache_resource
+def get_archive():
+    return Archive()
 
-# Initialize lines if not present
-if 'lines' not in st.session_state:
-    st.session_state['lines'] = []
+archive = get_archive()
 
 # App title and instructions
 st.title("CCAR batch upload tool")
@@ -158,75 +117,6 @@ if generate_button:
             st.text_area("Client Data JSON", json.dumps(client_data), height=200)
             st.success("Client data ready to be copied")
 
-# Function to parse fixed-width text into a dictionary
-def parse_fixed_width_text(text, config_df):
-    """Parse fixed-width text based on config_df specifications."""
-    fields = {}
-    text = text.strip()
-    
-    if not text:
-        return fields
-    
-    # Sort config by order to ensure correct parsing
-    sorted_config = config_df.sort_values('order')
-    
-    # Keep track of the current position in the text
-    pos = 0
-    
-    for _, row in sorted_config.iterrows():
-        field_name = row['name']
-        length = int(row['length'])
-        
-        # Extract the value for this field
-        if pos < len(text):
-            # Get the slice of text for this field
-            value = text[pos:pos+length].strip()
-            
-            # Store non-empty values
-            if value:
-                fields[field_name] = value
-            
-            # Move to the next position
-            pos += length
-        else:
-            # We've reached the end of the text
-            break
-    
-    return fields
-
-# Function to merge two JSON objects based on json_priority
-def merge_json_by_priority(json1, json2, config_df):
-    # Create a copy of the first JSON as the base
-    merged_json = json1.copy()
-    
-    # Create a mapping of field names to their priority
-    field_priorities = {}
-    for _, row in config_df.iterrows():
-        field_name = row['name']
-        # Default to 'admissions' if json_priority not specified
-        priority = row.get('json_priority', 'admissions')
-        field_priorities[field_name] = priority
-    
-    # Merge fields from json2 based on priority
-    for field_name, value in json2.items():
-        # Skip empty values
-        if not value:
-            continue
-            
-        # If field exists in json1 and has value, check priority
-        if field_name in json1 and json1[field_name]:
-            # Get priority for this field (default to 'admissions' if not found)
-            priority = field_priorities.get(field_name, 'admissions')
-            
-            # If priority is 'discharge', use json2's value
-            if priority == 'discharge':
-                merged_json[field_name] = value
-        else:
-            # If field doesn't exist in json1 or has no value, use json2's value
-            merged_json[field_name] = value
-    
-    return merged_json
-
 # Input Client JSON Data
 st.header("Paste Clinical Notes AI output here")
 
@@ -263,29 +153,26 @@ if process_button:
     try:
         # Process primary input based on selected format
         fields = {}
+        # Set when the input was CSV: the record as CsvMapping mapped it, used as is
+        primary_record = None
         primary_parse_success = False
         
         # Parse based on the selected format
         if input_format == "CSV":
-            # Process CSV data using the csv_processor module
+            # Map the CSV straight to records; parsing also validates the input
             try:
-                # Validate CSV input
-                is_valid, error_message = validate_csv_input(json_input_primary, st.session_state['csv_to_fl_config'])
+                # Use the first CSV row, in the layout version of its Effective Date
+                _, primary_record = next(iter_versioned_records(json_input_primary, 'csv', registry))
+                # The dict only dates the record and checks that it has values
+                fields = primary_record.to_dict()
                 
-                if is_valid:
-                    # Convert CSV to fixed-length text
-                    fixed_length_text = process_csv_to_fixed_length(json_input_primary, st.session_state['csv_to_fl_config'])
-                    
-                    # Parse the fixed-length text using the existing logic
-                    fields = parse_fixed_width_text(fixed_length_text, st.session_state['config_df'])
-                    
-                    if fields:
-                        primary_parse_success = True
-                        st.success("Successfully processed CSV input to fixed-length format")
-                    else:
-                        st.error("Failed to parse the generated fixed-length text")
+                if fields:
+                    primary_parse_success = True
+                    st.success("Successfully processed CSV input")
                 else:
-                    st.error(f"CSV validation error: {error_message}")
+                    st.error("CSV input did not contain any field values")
+            except ValueError as e:
+                st.error(f"CSV validation error: {e}")
             except Exception as e:
                 st.error(f"Error processing CSV input: {e}")
                 
@@ -315,7 +202,7 @@ if process_button:
         if not primary_parse_success and (input_format == "Fixed-width" or input_format == "Auto-detect"):
             try:
                 # Parse the fixed-width text
-                fields = parse_fixed_width_text(json_input_primary, st.session_state['config_df'])
+                fields = parse_fixed_width_text(json_input_primary, registry.layout_for_line(json_input_primary.strip()))
                 
                 if fields:
                     primary_parse_success = True
@@ -338,6 +225,8 @@ if process_button:
         
         # Only proceed if we successfully parsed the primary input
         if primary_parse_success and isinstance(fields, dict):
+            secondary_fields = None
+            secondary_record = None
             # Check if we need to merge with secondary input
             if enable_merge and secondary_input.strip():
                 secondary_data = {}
@@ -362,30 +251,25 @@ if process_button:
                         # Check if it looks like CSV (contains commas and newlines)
                         if ',' in secondary_input and '\n' in secondary_input:
                             try:
-                                # Validate and process as CSV
-                                is_valid, error_message = validate_csv_input(secondary_input, st.session_state['csv_to_fl_config'])
+                                # Map the first CSV row straight to a record; parsing also validates the input
+                                _, csv_record = next(iter_versioned_records(secondary_input, 'csv', registry))
+                                csv_data = csv_record.to_dict()
                                 
-                                if is_valid:
-                                    # Convert to fixed-length
-                                    fixed_length_text = process_csv_to_fixed_length(secondary_input, st.session_state['csv_to_fl_config'])
-                                    
-                                    # Parse the fixed-length text
-                                    csv_data = parse_fixed_width_text(fixed_length_text, st.session_state['config_df'])
-                                    
-                                    if csv_data:
-                                        secondary_data.update(csv_data)
-                                        merge_occurred = True
-                                        st.success("Successfully parsed secondary input as CSV")
-                                    else:
-                                        st.warning("Could not parse secondary CSV input, trying as fixed-width...")
+                                if csv_data:
+                                    secondary_data.update(csv_data)
+                                    secondary_record = csv_record
+                                    merge_occurred = True
+                                    st.success("Successfully parsed secondary input as CSV")
                                 else:
-                                    st.warning(f"CSV validation error for secondary input: {error_message}, trying as fixed-width...")
+                                    st.warning("Could not parse secondary CSV input, trying as fixed-width...")
+                            except ValueError as e:
+                                st.warning(f"CSV validation error for secondary input: {e}, trying as fixed-width...")
                             except Exception as e:
                                 st.warning(f"Error processing secondary CSV input: {e}, trying as fixed-width...")
                                 
                         # Try to parse as fixed-width text
                         if not merge_occurred:
-                            fixed_width_data = parse_fixed_width_text(secondary_input, st.session_state['config_df'])
+                            fixed_width_data = parse_fixed_width_text(secondary_input, registry.layout_for_line(secondary_input.strip()))
                             
                             if fixed_width_data:
                                 # Add to secondary data
@@ -405,187 +289,282 @@ if process_button:
                                 except json.JSONDecodeError:
                                     st.error("Could not parse secondary input - it doesn't appear to be valid JSON, CSV, or fixed-width text")
                     
-                    # Merge the data if we have secondary data
+                    # Merge the data below if we have secondary data
                     if secondary_data and merge_occurred:
-                        fields = merge_json_by_priority(fields, secondary_data, st.session_state['config_df'])
-                        st.success("Successfully merged inputs based on priority rules")
+                        secondary_fields = secondary_data
                         
                 except Exception as e:
                     st.error(f"Error processing secondary input: {e}")
             
-            # Apply rules to update field values
-            fields = apply_rules(fields, st.session_state['rules'])
+            # Use the layout version in force on the record's Effective Date,
+            # which the discharge record provides when merging
+            dated_fields = secondary_fields if secondary_fields and secondary_fields.get("Effective Date") else fields
+            version = registry.version_for_fields(dated_fields)
+            # Keys are matched to config.csv names through the alias index; report any that match nothing
+            unknown_fields = []
+            if primary_record is not None:
+                record = primary_record.to_layout(version.layout)
+            else:
+                record = Record.from_dict(fields, version.layout, unknown_fields)
             
-            # Format into fixed-length string
-            config_df = st.session_state['config_df']
-            line = ""
-            for _, row in config_df.sort_values('order').iterrows():
-                field_name = row['name']
-                length = int(row['length'])
-                alignment = row['alignment'].lower()
-                # Get the value, convert to string, and remove spaces
-                value = str(fields.get(field_name, '')).strip()
-                
-                # Special handling for diagnosis fields - remove periods
-                if field_name in ["Primary Diagnosis 1", "DC03 AXIS I Primary Diagnosis"]:
-                    value = value.replace(".", "")
-                
-                # For fixed-length output, we sometimes need to preserve spaces
-                # rather than removing them all
-                if alignment == 'left':
-                    formatted_value = value[:length].ljust(length)
-                elif alignment == 'right':
-                    formatted_value = value[:length].rjust(length)
+            # A discharge without pasted admission data is merged onto the client's archived admission
+            if not secondary_fields and record.get("Action Type").strip() == "03":
+                admission_line = archive.latest_admission(record.get("Client ID/Trails ID"),
+                                                          record.get("Medicaid/State Identifier"))
+                if admission_line:
+                    admission = Record.from_line(admission_line, registry.layout_for_line(admission_line))
+                    admission = admission.to_layout(version.layout)
+                    record = merge_records(admission, record)
+                    st.success("Merged with the client's archived admission record")
                 else:
-                    st.error(f"Invalid alignment for field {field_name}: {alignment}")
-                    break
-                line += formatted_value
-            else:
-                st.session_state['lines'].append(line)
-                st.success("Client data processed and added to text file")
+                    st.info("No archived admission found for this client; demographics were not merged")
+            
+            if secondary_fields:
+                if secondary_record is not None:
+                    secondary = secondary_record.to_layout(version.layout)
+                else:
+                    secondary = Record.from_dict(secondary_fields, version.layout, unknown_fields)
+                record = merge_records(record, secondary)
+                st.success("Successfully merged inputs based on priority rules")
+            
+            if unknown_fields:
+                st.warning(f"Ignored fields not in config.csv: {', '.join(dict.fromkeys(unknown_fields))}")
+            
+            # Apply rules and format into fixed-length string
+            line = convert_record(record, version.rules)
+            st.session_state['batch'].append(line)
+            st.success("Client data processed and added to text file")
     except json.JSONDecodeError:
         st.error("Invalid primary JSON input")
     except Exception as e:
         st.error(f"Error processing data: {e}")
 
+# Views derived from the batch are built once per batch change and reused across reruns
+def build_client_view(index, line):
+    """Label one client and split its line into (field, value) pairs."""
+    # Extract the exact values including spaces, using the line's own layout version
+    layout = registry.layout_for_line(line)
+    client_data = list(zip(layout.names, split_fixed_width(line, layout)))
+    # Get first and last name for label, stripping spaces for display
+    first_name = line[slice(*layout.offset_of("First Name"))].strip()
+    last_name = line[slice(*layout.offset_of("Last Name"))].strip()
+    # Construct label using First Name and Last Name; if missing, use placeholders
+    label = f"{first_name} {last_name}".strip() or f"Unnamed Client {index + 1}"
+    return label, client_data
+
+def build_client_views(lines):
+    """Label each client and split its line into (field, value) pairs."""
+    views = [build_client_view(index, line) for index, line in enumerate(lines)]
+    return [label for label, _ in views], [client_data for _, client_data in views]
+
+def update_client_views(views, index, line):
+    """Patch the views of one edited client instead of rebuilding them all."""
+    client_names, client_data_list = views
+    client_names[index], client_data_list[index] = build_client_view(index, line)
+    return views
+
+def build_version_tables(lines):
+    """Split lines into one DataFrame per layout version, since each version has its own columns."""
+    lines_by_version = {}
+    for line in lines:
+        lines_by_version.setdefault(registry.version_for_line(line), []).append(line)
+    tables = []
+    for version, version_lines in lines_by_version.items():
+        # Prepare headers with order number, field names, and lengths
+        headers = [f"{field.order}: {field.name} (Length: {field.length})"
+                   for field in version.layout.fields]
+        tables.append((version.name, lines_to_dataframe(version_lines, version.layout, headers)))
+    return tables
+
 # Preview Text File
-st.header("Preview Text File")
-if st.session_state['lines']:
-    preview_text = '\n'.join(st.session_state['lines'])
-    st.code(preview_text, language='text')
-else:
-    st.info("No data in text file yet")
-
-# Add a text area for pasting fixed-length text
-# This section is hidden but kept for future use
-show_fixed_length_section = False  # Set to True to show this section
-if show_fixed_length_section:
-    st.header("Paste Fixed-Length Text")
-    fixed_length_text = st.text_area("Paste fixed-length text here")
-
-    # Button to process the pasted fixed-length text
-    if st.button("Process Pasted Text"):
-        if fixed_length_text:
-            st.session_state['lines'] = fixed_length_text.split('\n')
-            st.success("Pasted text processed and added to text file")
+@st.fragment
+def render_preview():
+    st.header("Preview Text File")
+    batch = st.session_state['batch']
+    if batch:
+        st.code(batch.view('preview_text', '\n'.join), language='text')
+    else:
+        st.info("No data in text file yet")
+
+render_preview()
+
+# Upload an existing .car file to resume or extend a batch
+st.header("Upload .car File")
+uploaded_car_file = st.file_uploader("Resume or extend a batch from a .car file", type=["car", "txt"], key="car_upload")
+upload_mode = st.radio("Uploaded records", ["Append to the current batch", "Replace the current batch"], horizontal=True)
+if st.button("Load .car File"):
+    if uploaded_car_file is not None:
+        # Every record is checked before any is added, so a bad file leaves the batch as it was
+        try:
+            count = st.session_state['batch'].load(uploaded_car_file,
+                                                   {version.layout.width for version in registry.versions},
+                                                   replace=upload_mode == "Replace the current batch")
+        except ValueError as e:
+            st.error(f"Could not load {uploaded_car_file.name}: {e}")
         else:
-            st.error("No text to process")
+            st.success(f"Loaded {count} records from {uploaded_car_file.name}")
+            st.rerun()
+    else:
+        st.error("No file to load")
 
 # Verify Client Data
-st.header("Verify Client Data")
+# Runs as a fragment so choosing a client only reruns this section
+@st.fragment
+def render_verification():
+    st.header("Verify Client Data")
+    batch = st.session_state['batch']
 
-# Toggle for showing/hiding verification sections
-show_verification = st.checkbox("Show verification sections", value=False)
+    # Toggle for showing/hiding verification sections
+    show_verification = st.checkbox("Show verification sections", value=False)
+    if not show_verification:
+        return
 
-if show_verification:
     # Verify Client Data (Individual Clients)
     st.subheader("Individual Client Data")
     st.markdown("Select a client to verify their individual field values based on the fixed-length format.")
-    if st.session_state['lines']:
-        # Create a list of client names for the selectbox
-        client_names = []
-        client_data_list = []
-        
-        for index, line in enumerate(st.session_state['lines']):
-            client_data = {}
-            start = 0
-            for _, row in st.session_state['config_df'].sort_values('order').iterrows():
-                field_name = row['name']
-                length = int(row['length'])
-                # Extract the exact value including spaces
-                value = line[start:start + length]
-                client_data[field_name] = value
-                start += length
-            # Get first and last name for label, stripping spaces for display
-            first_name = client_data.get("First Name", "").strip()
-            last_name = client_data.get("Last Name", "").strip()
-            # Construct label using First Name and Last Name; if missing, use placeholders
-            label = f"{first_name} {last_name}".strip() or f"Unnamed Client {index + 1}"
-            
-            client_names.append(label)
-            client_data_list.append(client_data)
+    if batch:
+        client_names, client_data_list = batch.view('client_views', build_client_views, update_client_views)
         
         # Create a selectbox for choosing a client
         selected_client_index = st.selectbox("Select a client to view details", range(len(client_names)), format_func=lambda i: client_names[i])
         
         # Display the selected client's data
         st.subheader(f"Details for {client_names[selected_client_index]}")
-        df = pd.DataFrame(list(client_data_list[selected_client_index].items()), columns=["Field", "Value"])
+        df = pd.DataFrame(client_data_list[selected_client_index], columns=["Field", "Value"])
         st.dataframe(df)
+        
+        # Correct a field of this record in place; only its bytes and the rules that read it are redone
+        line = batch[selected_client_index]
+        version = registry.version_for_line(line)
+        with st.form("edit_field_form"):
+            field_name = st.selectbox("Field to correct", list(dict.fromkeys(version.layout.names)))
+            new_value = st.text_input("New value")
+            if st.form_submit_button("Update Field"):
+                try:
+                    batch.replace(selected_client_index,
+                                  edit_line(line, version.layout, {field_name: new_value}, version.rules))
+                except ValueError as e:
+                    st.error(f"Error updating field: {e}")
+                else:
+                    # Rerun the whole app so the preview and download sections pick up the edit
+                    st.rerun()
     else:
         st.info("No client data to verify")
 
     # Verify Client Data (Table View)
     st.subheader("All Clients Data Table")
     st.markdown("This table shows each client's data with fields split into columns as defined in config.csv. Headers include the order number, field names, and required lengths.")
-    if st.session_state['lines']:
-        # Prepare headers with order number, field names, and lengths
-        headers = [f"{row['order']}: {row['name']} (Length: {row['length']})" 
-                   for _, row in st.session_state['config_df'].sort_values('order').iterrows()]
-        # Prepare data for the table
-        table_data = []
-        for line in st.session_state['lines']:
-            start = 0
-            row_data = []
-            for _, row in st.session_state['config_df'].sort_values('order').iterrows():
-                length = int(row['length'])
-                # Extract the exact value including spaces
-                value = line[start:start + length]
-                row_data.append(value)
-                start += length
-            table_data.append(row_data)
-        # Create DataFrame
-        df_table = pd.DataFrame(table_data, columns=headers)
-        # Display the DataFrame
-        st.dataframe(df_table)
+    if batch:
+        tables = batch.view('version_tables', build_version_tables)
+        for version_name, df_table in tables:
+            if len(tables) > 1:
+                st.markdown(f"**Layout version: {version_name}**")
+            st.dataframe(df_table)
     else:
         st.info("No client data to verify")
 
-# Function to extract the latest Effective Date
-def get_latest_effective_date(lines, config_df):
-    latest_date = None
-    for line in lines:
-        start = 0
-        for _, row in config_df.sort_values('order').iterrows():
-            field_name = row['name']
-            length = int(row['length'])
-            value = line[start:start + length].strip()
-            start += length
-            if field_name.lower() == 'effective date':
-                try:
-                    # Parse the date in MMDDYYYY format
-                    date_value = pd.to_datetime(value, format='%m%d%Y')
-                    if latest_date is None or date_value > latest_date:
-                        latest_date = date_value
-                except ValueError:
-                    continue
-    return latest_date
+render_verification()
 
-# Manage Text File
-st.header("Manage Text File")
-col1, col2 = st.columns(2)
-with col1:
-    if st.session_state['lines']:
-        # Convert lines to CRLF line terminators
-        file_content = '\r\n'.join(st.session_state['lines']) + '\r\n'
-        file_content = file_content.encode('utf-8')
+# Compare .car Files
+@st.fragment
+def render_comparison():
+    st.header("Compare .car Files")
+
+    # Toggle for showing/hiding the comparison section
+    show_comparison = st.checkbox("Show comparison section", value=False)
+    if not show_comparison:
+        return
+
+    st.markdown("Compare a previously submitted .car file with a corrected one. Records are matched by Client ID/Trails ID and Action Type.")
+    col1, col2 = st.columns(2)
+    with col1:
+        old_car_file = st.file_uploader("Previously submitted .car file", type=["car", "txt"], key="diff_old_file")
+    with col2:
+        new_car_file = st.file_uploader("Corrected .car file (leave empty to use the current text file)", type=["car", "txt"], key="diff_new_file")
+    
+    if old_car_file is not None:
+        # Like uploads, .car files must be UTF-8
+        try:
+            old_lines = read_car_lines(old_car_file.getvalue())
+            new_lines = read_car_lines(new_car_file.getvalue()) if new_car_file is not None else st.session_state['batch'].lines
+        except ValueError as e:
+            st.error(f"Could not read the .car files: {e}")
+            return
+        result = diff_car(old_lines, new_lines, registry)
         
-        # Get the latest Effective Date
-        latest_date = get_latest_effective_date(st.session_state['lines'], st.session_state['config_df'])
-        if latest_date:
-            file_name = f"194{latest_date.strftime('%m%y')}.car"
-        else:
-            file_name = "clients_data.car"
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Added", len(result.added))
+        col2.metric("Removed", len(result.removed))
+        col3.metric("Changed", len(result.changed))
+        col4.metric("Unchanged", result.unchanged)
         
-        st.download_button(
-            label="Download Text File",
-            data=file_content,
-            file_name=file_name,
-            mime="text/plain"
-        )
+        rows = diff_rows(result)
+        if rows:
+            st.dataframe(pd.DataFrame(rows, columns=["Client", "Status", "Field", "Before", "After"]))
+        else:
+            st.success("The files contain the same records")
     else:
-        st.info("No data to download")
-with col2:
-    if st.button("Clear Text File"):
-        st.session_state['lines'] = []
-        st.success("Text file cleared")
\ No newline at end of file
+        st.info("Upload a .car file to compare")
+
+render_comparison()
+
+def build_month_zip(partitions):
+    """Stream the monthly partitions into an in-memory zip for download."""
+    buffer = io.BytesIO()
+    write_zip(partitions, buffer)
+    return buffer.getvalue()
+
+def archive_month_files(partitions):
+    """Archive each monthly file as it is in the downloaded zip."""
+    for name, lines in partitions.items():
+        archive.store(encode_batch(lines), registry, name)
+
+# Manage Text File
+@st.fragment
+def render_downloads():
+    st.header("Manage Text File")
+    batch = st.session_state['batch']
+    col1, col2 = st.columns(2)
+    with col1:
+        if batch:
+            # Lines were encoded when they were added; this only joins them with CRLF terminators
+            file_content = batch.to_bytes()
+            
+            # Every record must be exactly the layout width in bytes
+            invalid = batch.view('invalid_lines', lambda lines: batch.invalid_lines(
+                {version.layout.width for version in registry.versions}))
+            if invalid:
+                st.warning(f"{len(invalid)} line(s) are not the layout width: "
+                           + ", ".join(str(index + 1) for index in invalid[:20]))
+            
+            # Name the file after the latest Effective Date
+            file_name = batch.view('file_name', lambda lines: batch_file_name(lines, registry))
+            
+            st.download_button(
+                label="Download Text File",
+                data=file_content,
+                file_name=file_name,
+                mime="text/plain",
+                on_click=lambda: archive.store(file_content, registry, file_name)
+            )
+            
+            # Batches covering several reporting months are also offered as one .car file per month
+            partitions = batch.view('month_partitions', lambda lines: partition_by_month(lines, registry))
+            if len(partitions) > 1:
+                st.download_button(
+                    label=f"Download {len(partitions)} Monthly Files (.zip)",
+                    data=batch.view('month_zip', lambda lines: build_month_zip(partitions)),
+                    file_name=f"{file_name[:-len('.car')]}_by_month.zip",
+                    mime="application/zip",
+                    on_click=lambda: archive_month_files(partitions)
+                )
+                st.caption(", ".join(f"{name} ({len(lines)})" for name, lines in partitions.items()))
+        else:
+            st.info("No data to download")
+    with col2:
+        if st.button("Clear Text File"):
+            batch.clear()
+            # Rerun the whole app so the preview and verification sections update too
+            st.rerun()
+
+render_downloads()